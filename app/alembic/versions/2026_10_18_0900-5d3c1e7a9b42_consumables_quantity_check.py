@@ -0,0 +1,30 @@
+"""consumables quantity check
+
+Revision ID: 5d3c1e7a9b42
+Revises: 09a21129dd42
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5d3c1e7a9b42"
+down_revision: Union[str, None] = "09a21129dd42"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # NOT VALID enforces the constraint for new writes without failing on
+    # rows that went negative before it existed.
+    op.execute(
+        "ALTER TABLE consumables "
+        "ADD CONSTRAINT consumables_quantity_check CHECK (quantity >= 0) NOT VALID"
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint("consumables_quantity_check", "consumables", type_="check")
@@ -0,0 +1,44 @@
+"""consumables name unique
+
+Revision ID: 8f2a4c6d1e07
+Revises: 5d3c1e7a9b42
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8f2a4c6d1e07"
+down_revision: Union[str, None] = "5d3c1e7a9b42"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Which of two consumables with the same name to keep, or how to rename
+    # them, is not for a migration to decide.
+    duplicates = (
+        op.get_bind()
+        .scalars(
+            sa.text(
+                "SELECT name FROM consumables GROUP BY name HAVING count(*) > 1 "
+                "ORDER BY name LIMIT 20"
+            )
+        )
+        .all()
+    )
+    if duplicates:
+        raise RuntimeError(
+            "Consumable names must be unique before this migration, rename or "
+            "merge the consumables named: " + ", ".join(map(repr, duplicates))
+        )
+
+    op.create_unique_constraint("consumables_name_key", "consumables", ["name"])
+
+
+def downgrade() -> None:
+    op.drop_constraint("consumables_name_key", "consumables", type_="unique")
@@ -0,0 +1,61 @@
+"""foreign key indexes
+
+Revision ID: b71e3f90c5a8
+Revises: 8f2a4c6d1e07
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b71e3f90c5a8"
+down_revision: Union[str, None] = "8f2a4c6d1e07"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY cannot run inside a transaction, but it does not block
+    # writes to the tables while the indexes are built.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_consumables_category_id",
+            "consumables",
+            ["category_id"],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_consumable_history_consumable_id_history_id",
+            "consumable_history",
+            ["consumable_id", sa.text("history_id DESC")],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_user_sessions_user_id",
+            "user_sessions",
+            ["user_id"],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_user_sessions_user_id",
+            "user_sessions",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_consumable_history_consumable_id_history_id",
+            "consumable_history",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_consumables_category_id",
+            "consumables",
+            postgresql_concurrently=True,
+        )
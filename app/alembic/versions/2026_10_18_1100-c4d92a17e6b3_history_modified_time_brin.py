@@ -0,0 +1,39 @@
+"""history modified_time brin
+
+Revision ID: c4d92a17e6b3
+Revises: b71e3f90c5a8
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c4d92a17e6b3"
+down_revision: Union[str, None] = "b71e3f90c5a8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # History is append-only with increasing modified_time, which a BRIN
+    # index covers at a fraction of the size of a btree.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_consumable_history_modified_time",
+            "consumable_history",
+            ["modified_time"],
+            postgresql_using="brin",
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_consumable_history_modified_time",
+            "consumable_history",
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,64 @@
+"""consumable daily stats
+
+Revision ID: e5a1b8c3d290
+Revises: c4d92a17e6b3
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e5a1b8c3d290"
+down_revision: Union[str, None] = "c4d92a17e6b3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "consumable_daily_stats",
+        sa.Column("consumable_id", sa.String(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("inflow", sa.Integer(), nullable=False),
+        sa.Column("outflow", sa.Integer(), nullable=False),
+        sa.Column("movement_count", sa.Integer(), nullable=False),
+        sa.Column("closing_quantity", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["consumable_id"],
+            ["consumables.consumable_id"],
+            ondelete="CASCADE",
+        ),
+        sa.PrimaryKeyConstraint("consumable_id", "day"),
+    )
+    # Same as `flask rebuild-daily-stats`.
+    op.execute(
+        """
+        INSERT INTO consumable_daily_stats
+        SELECT daily.consumable_id, daily.day, daily.inflow, daily.outflow,
+               daily.movement_count,
+               consumables.quantity - COALESCE(SUM(daily.net) OVER (
+                   PARTITION BY daily.consumable_id ORDER BY daily.day DESC
+                   ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+               ), 0)
+        FROM (
+            SELECT consumable_id, CAST(modified_time AS DATE) AS day,
+                   COALESCE(SUM(modified_count)
+                       FILTER (WHERE modified_count > 0), 0) AS inflow,
+                   COALESCE(-SUM(modified_count)
+                       FILTER (WHERE modified_count < 0), 0) AS outflow,
+                   SUM(modified_count) AS net,
+                   COUNT(*) AS movement_count
+            FROM consumable_history
+            GROUP BY consumable_id, CAST(modified_time AS DATE)
+        ) AS daily
+        JOIN consumables ON consumables.consumable_id = daily.consumable_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("consumable_daily_stats")
@@ -0,0 +1,36 @@
+"""history consumable modified_time index
+
+Revision ID: f0c7d3a8b514
+Revises: e5a1b8c3d290
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f0c7d3a8b514"
+down_revision: Union[str, None] = "e5a1b8c3d290"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_consumable_history_consumable_id_modified_time",
+            "consumable_history",
+            ["consumable_id", "modified_time"],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_consumable_history_consumable_id_modified_time",
+            "consumable_history",
+            postgresql_concurrently=True,
+        )
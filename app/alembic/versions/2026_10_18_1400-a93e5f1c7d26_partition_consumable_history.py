@@ -0,0 +1,133 @@
+"""partition consumable history
+
+Revision ID: a93e5f1c7d26
+Revises: f0c7d3a8b514
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+
+from datetime import date
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a93e5f1c7d26"
+down_revision: Union[str, None] = "f0c7d3a8b514"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+
+
+def add_months(month: date, months: int) -> date:
+    month_index = month.year * 12 + month.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def create_indexes() -> None:
+    op.create_index(
+        "ix_consumable_history_consumable_id_history_id",
+        "consumable_history",
+        ["consumable_id", sa.text("history_id DESC")],
+    )
+    op.create_index(
+        "ix_consumable_history_consumable_id_modified_time",
+        "consumable_history",
+        ["consumable_id", "modified_time"],
+    )
+    op.create_index(
+        "ix_consumable_history_modified_time",
+        "consumable_history",
+        ["modified_time"],
+        postgresql_using="brin",
+    )
+
+
+def upgrade() -> None:
+    op.rename_table("consumable_history", "consumable_history_unpartitioned")
+    op.execute(
+        """
+        CREATE TABLE consumable_history (
+            history_id BIGINT NOT NULL
+                DEFAULT nextval('consumable_history_history_id_seq'),
+            modified_count INTEGER NOT NULL,
+            modified_time TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            description VARCHAR,
+            consumable_id VARCHAR NOT NULL
+                CONSTRAINT consumable_history_consumable_id_fkey
+                REFERENCES consumables (consumable_id)
+        ) PARTITION BY RANGE (modified_time)
+        """
+    )
+
+    first_month = op.get_bind().scalar(
+        sa.text(
+            "SELECT CAST(date_trunc('month', min(modified_time)) AS DATE) "
+            "FROM consumable_history_unpartitioned"
+        )
+    )
+    current_month = date.today().replace(day=1)
+    month = min(first_month or current_month, current_month)
+    while month <= add_months(current_month, MONTHS_AHEAD):
+        op.execute(
+            f"CREATE TABLE consumable_history_y{month:%Ym%m} "
+            "PARTITION OF consumable_history "
+            f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+        )
+        month = add_months(month, 1)
+    op.execute(
+        "CREATE TABLE consumable_history_default "
+        "PARTITION OF consumable_history DEFAULT"
+    )
+
+    op.execute(
+        "INSERT INTO consumable_history SELECT * FROM consumable_history_unpartitioned"
+    )
+    op.execute("ALTER SEQUENCE consumable_history_history_id_seq AS BIGINT")
+    op.execute(
+        "ALTER SEQUENCE consumable_history_history_id_seq "
+        "OWNED BY consumable_history.history_id"
+    )
+    op.drop_table("consumable_history_unpartitioned")
+
+    # A primary key of a partitioned table has to include the partition key.
+    op.create_primary_key(
+        "consumable_history_pkey",
+        "consumable_history",
+        ["history_id", "modified_time"],
+    )
+    create_indexes()
+
+
+def downgrade() -> None:
+    op.rename_table("consumable_history", "consumable_history_partitioned")
+    op.execute(
+        """
+        CREATE TABLE consumable_history (
+            history_id INTEGER NOT NULL
+                DEFAULT nextval('consumable_history_history_id_seq'),
+            modified_count INTEGER NOT NULL,
+            modified_time TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            description VARCHAR,
+            consumable_id VARCHAR NOT NULL
+                CONSTRAINT consumable_history_consumable_id_fkey
+                REFERENCES consumables (consumable_id)
+        )
+        """
+    )
+    op.execute(
+        "INSERT INTO consumable_history SELECT * FROM consumable_history_partitioned"
+    )
+    op.execute("ALTER SEQUENCE consumable_history_history_id_seq AS INTEGER")
+    op.execute(
+        "ALTER SEQUENCE consumable_history_history_id_seq "
+        "OWNED BY consumable_history.history_id"
+    )
+    op.drop_table("consumable_history_partitioned")
+
+    op.create_primary_key(
+        "consumable_history_pkey", "consumable_history", ["history_id"]
+    )
+    create_indexes()
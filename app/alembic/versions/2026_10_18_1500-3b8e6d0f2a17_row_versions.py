@@ -0,0 +1,35 @@
+"""row versions
+
+Revision ID: 3b8e6d0f2a17
+Revises: a93e5f1c7d26
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3b8e6d0f2a17"
+down_revision: Union[str, None] = "a93e5f1c7d26"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # A constant default does not rewrite the table.
+    op.add_column(
+        "consumable_categories",
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+    )
+    op.add_column(
+        "consumables",
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("consumables", "version")
+    op.drop_column("consumable_categories", "version")
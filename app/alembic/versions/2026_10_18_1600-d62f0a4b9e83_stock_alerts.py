@@ -0,0 +1,58 @@
+"""stock alerts
+
+Revision ID: d62f0a4b9e83
+Revises: 3b8e6d0f2a17
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d62f0a4b9e83"
+down_revision: Union[str, None] = "3b8e6d0f2a17"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "consumables",
+        sa.Column(
+            "min_quantity",
+            sa.Integer(),
+            sa.CheckConstraint("min_quantity >= 0"),
+            nullable=True,
+        ),
+    )
+    op.create_table(
+        "stock_alerts",
+        sa.Column("alert_id", sa.BigInteger(), nullable=False),
+        sa.Column("consumable_id", sa.String(), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("min_quantity", sa.Integer(), nullable=False),
+        sa.Column("opened_at", sa.DateTime(), nullable=False),
+        sa.Column("closed_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["consumable_id"],
+            ["consumables.consumable_id"],
+            ondelete="CASCADE",
+        ),
+        sa.PrimaryKeyConstraint("alert_id"),
+    )
+    op.create_index(
+        "ix_stock_alerts_open_consumable_id",
+        "stock_alerts",
+        ["consumable_id"],
+        unique=True,
+        postgresql_where=sa.text("closed_at IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_stock_alerts_open_consumable_id", "stock_alerts")
+    op.drop_table("stock_alerts")
+    op.drop_column("consumables", "min_quantity")
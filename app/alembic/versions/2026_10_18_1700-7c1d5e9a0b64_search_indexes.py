@@ -0,0 +1,63 @@
+"""search indexes
+
+Revision ID: 7c1d5e9a0b64
+Revises: d62f0a4b9e83
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "7c1d5e9a0b64"
+down_revision: Union[str, None] = "d62f0a4b9e83"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must stay the same expressions as app.models.consumable.search_document.
+CATEGORY_DOCUMENT = (
+    "setweight(to_tsvector('simple'::regconfig, coalesce(name, '')), 'A')"
+)
+CONSUMABLE_DOCUMENT = (
+    "(setweight(to_tsvector('simple'::regconfig, coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(description, '')), 'B'))"
+)
+
+INDEXES = [
+    ("ix_consumable_categories_search", "consumable_categories", CATEGORY_DOCUMENT),
+    ("ix_consumables_search", "consumables", CONSUMABLE_DOCUMENT),
+    ("ix_consumable_categories_name_trgm", "consumable_categories", None),
+    ("ix_consumables_name_trgm", "consumables", None),
+]
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    with op.get_context().autocommit_block():
+        for name, table, document in INDEXES:
+            if document is None:
+                op.create_index(
+                    name,
+                    table,
+                    ["name"],
+                    postgresql_using="gin",
+                    postgresql_ops={"name": "gin_trgm_ops"},
+                    postgresql_concurrently=True,
+                )
+            else:
+                op.create_index(
+                    name,
+                    table,
+                    [sa.text(document)],
+                    postgresql_using="gin",
+                    postgresql_concurrently=True,
+                )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table, postgresql_concurrently=True)
@@ -0,0 +1,52 @@
+"""list sort indexes
+
+Revision ID: 58a3c0e7f4d1
+Revises: 7c1d5e9a0b64
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "58a3c0e7f4d1"
+down_revision: Union[str, None] = "7c1d5e9a0b64"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    (
+        "ix_consumable_categories_created_at_category_id",
+        "consumable_categories",
+        ["created_at", "category_id"],
+    ),
+    (
+        "ix_consumables_category_id_name",
+        "consumables",
+        ["category_id", "name", "consumable_id"],
+    ),
+    (
+        "ix_consumables_category_id_quantity",
+        "consumables",
+        ["category_id", "quantity", "consumable_id"],
+    ),
+    (
+        "ix_consumables_category_id_created_at",
+        "consumables",
+        ["category_id", "created_at", "consumable_id"],
+    ),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table, postgresql_concurrently=True)
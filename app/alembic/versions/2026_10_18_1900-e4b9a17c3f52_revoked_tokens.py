@@ -0,0 +1,35 @@
+"""revoked tokens
+
+Revision ID: e4b9a17c3f52
+Revises: 58a3c0e7f4d1
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e4b9a17c3f52"
+down_revision: Union[str, None] = "58a3c0e7f4d1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "revoked_tokens",
+        sa.Column("token_id", sa.String(), nullable=False),
+        sa.Column("expiration_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("token_id"),
+    )
+    op.create_index(
+        "ix_revoked_tokens_expiration_at", "revoked_tokens", ["expiration_at"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_revoked_tokens_expiration_at", "revoked_tokens")
+    op.drop_table("revoked_tokens")
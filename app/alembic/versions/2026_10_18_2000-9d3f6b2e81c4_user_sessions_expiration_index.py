@@ -0,0 +1,36 @@
+"""user sessions expiration index
+
+Revision ID: 9d3f6b2e81c4
+Revises: e4b9a17c3f52
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9d3f6b2e81c4"
+down_revision: Union[str, None] = "e4b9a17c3f52"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_user_sessions_expiration_at",
+            "user_sessions",
+            ["expiration_at"],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_user_sessions_expiration_at",
+            "user_sessions",
+            postgresql_concurrently=True,
+        )
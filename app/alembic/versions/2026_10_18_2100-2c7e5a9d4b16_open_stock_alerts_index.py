@@ -0,0 +1,38 @@
+"""open stock alerts index
+
+Revision ID: 2c7e5a9d4b16
+Revises: 9d3f6b2e81c4
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "2c7e5a9d4b16"
+down_revision: Union[str, None] = "9d3f6b2e81c4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_stock_alerts_open_alert_id",
+            "stock_alerts",
+            ["alert_id"],
+            postgresql_where=sa.text("closed_at IS NULL"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_stock_alerts_open_alert_id",
+            "stock_alerts",
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,37 @@
+from flask import jsonify
+from flask_pydantic import validate
+from sqlalchemy import select
+
+from app.core.database import request_session
+from app.core.pagination import paginate
+from app.main import app
+from app.models.consumable import Consumable, GETAlertsParams, StockAlert
+
+
+@app.get("/alerts")
+@validate()
+def api_get_stock_alerts(query: GETAlertsParams):
+    with request_session() as db_session:
+        sql_query = select(*StockAlert.json_columns(), Consumable.category_id).join(
+            Consumable, StockAlert.consumable_id == Consumable.consumable_id
+        )
+        if query.state == "open":
+            sql_query = sql_query.where(StockAlert.closed_at.is_(None))
+        elif query.state == "closed":
+            sql_query = sql_query.where(StockAlert.closed_at.is_not(None))
+        if query.category_id:
+            sql_query = sql_query.where(Consumable.category_id == query.category_id)
+
+        try:
+            alerts, next_cursor = paginate(
+                db_session, sql_query, [(StockAlert.alert_id, True)], query
+            )
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+
+        return jsonify(
+            {
+                "alerts": alerts,
+                "next_cursor": next_cursor,
+            }
+        )
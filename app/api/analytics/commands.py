@@ -0,0 +1,15 @@
+import click
+
+from app.api.analytics.helpers import rebuild_daily_stats
+from app.core.database import session_maker
+from app.main import app
+
+
+@app.cli.command("rebuild-daily-stats")
+def rebuild_daily_stats_command():
+    """Rebuild consumable_daily_stats from the full history."""
+    with session_maker() as db_session:
+        rows = rebuild_daily_stats(db_session)
+        db_session.commit()
+
+    click.echo(f"Rebuilt {rows} daily stats rows")
@@ -0,0 +1,141 @@
+from datetime import time
+
+from flask import jsonify
+from flask_pydantic import validate
+from sqlalchemy import DateTime, cast, func, select
+
+from app.api.analytics.helpers import stock_at_query
+from app.core.database import request_session
+from app.main import app
+from app.models.consumable import (
+    Consumable,
+    ConsumableDailyStats,
+    ConsumableHistory,
+    GETMovementStatsParams,
+    GETStockParams,
+)
+
+
+@app.get("/analytics/movements")
+@validate()
+def api_get_movement_stats(query: GETMovementStatsParams):
+    # Whole-day ranges are answered from the daily rollup, which has one row
+    # per consumable and day instead of one per movement.
+    if (
+        query.bucket != "hour"
+        and query.since.time() == time()
+        and query.until.time() == time()
+    ):
+        sql_query = daily_movement_stats_query(query)
+    else:
+        sql_query = movement_stats_query(query)
+
+    with request_session() as db_session:
+        stats = db_session.execute(sql_query).all()
+
+    return jsonify({"stats": stats})
+
+
+@app.get("/categories/<category_id>/stock")
+@validate()
+def api_get_category_stock(category_id: str, query: GETStockParams):
+    consumables = select(Consumable.consumable_id).where(
+        Consumable.category_id == category_id
+    )
+    with request_session() as db_session:
+        stock = db_session.execute(stock_at_query(query.at, consumables)).all()
+
+    return jsonify({"stock": stock, "at": query.at})
+
+
+@app.get("/categories/<category_id>/consumables/<consumable_id>/stock")
+@validate()
+def api_get_consumable_stock(
+    category_id: str, consumable_id: str, query: GETStockParams
+):
+    consumables = (
+        select(Consumable.consumable_id)
+        .where(Consumable.category_id == category_id)
+        .where(Consumable.consumable_id == consumable_id)
+    )
+    with request_session() as db_session:
+        stock = db_session.execute(stock_at_query(query.at, consumables)).one_or_none()
+        if stock is None:
+            return jsonify({"error": "Consumable not found"}), 404
+
+    return jsonify({"stock": stock, "at": query.at})
+
+
+def movement_stats_query(query: GETMovementStatsParams):
+    modified_count = ConsumableHistory.modified_count
+    bucket = func.date_trunc(query.bucket, ConsumableHistory.modified_time)
+    group_by = {
+        "consumable": [ConsumableHistory.consumable_id],
+        "category": [Consumable.category_id],
+        "total": [],
+    }[query.group_by]
+
+    sql_query = (
+        select(
+            bucket.label("bucket"),
+            *group_by,
+            func.coalesce(func.sum(modified_count).filter(modified_count > 0), 0).label(
+                "inflow"
+            ),
+            func.coalesce(
+                -func.sum(modified_count).filter(modified_count < 0), 0
+            ).label("outflow"),
+            func.sum(modified_count).label("net"),
+            func.count().label("movements"),
+        )
+        .where(ConsumableHistory.modified_time >= query.since)
+        .where(ConsumableHistory.modified_time < query.until)
+        .group_by(bucket, *group_by)
+        .order_by(bucket, *group_by)
+    )
+    if query.group_by == "category" or query.category_id:
+        sql_query = sql_query.join(
+            Consumable, ConsumableHistory.consumable_id == Consumable.consumable_id
+        )
+    if query.category_id:
+        sql_query = sql_query.where(Consumable.category_id == query.category_id)
+    if query.consumable_id:
+        sql_query = sql_query.where(
+            ConsumableHistory.consumable_id == query.consumable_id
+        )
+    return sql_query
+
+
+def daily_movement_stats_query(query: GETMovementStatsParams):
+    stats = ConsumableDailyStats
+    bucket = func.date_trunc(query.bucket, cast(stats.day, DateTime))
+    group_by = {
+        "consumable": [stats.consumable_id],
+        "category": [Consumable.category_id],
+        "total": [],
+    }[query.group_by]
+
+    sql_query = (
+        select(
+            bucket.label("bucket"),
+            *group_by,
+            func.sum(stats.inflow).label("inflow"),
+            func.sum(stats.outflow).label("outflow"),
+            func.sum(stats.inflow - stats.outflow).label("net"),
+            func.sum(stats.movement_count).label("movements"),
+        )
+        .where(stats.day >= query.since.date())
+        .where(stats.day < query.until.date())
+        .where(stats.movement_count > 0)
+        .group_by(bucket, *group_by)
+        .order_by(bucket, *group_by)
+    )
+    if query.group_by == "category" or query.category_id:
+        sql_query = sql_query.join(
+            Consumable, stats.consumable_id == Consumable.consumable_id
+        )
+    if query.category_id:
+        sql_query = sql_query.where(Consumable.category_id == query.category_id)
+    if query.consumable_id:
+        sql_query = sql_query.where(stats.consumable_id == query.consumable_id)
+    return sql_query
@@ -0,0 +1,193 @@
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import (
+    Date,
+    case,
+    cast,
+    delete,
+    func,
+    insert,
+    literal,
+    null,
+    select,
+    text,
+    union_all,
+)
+
+from app.models.consumable import Consumable, ConsumableDailyStats, ConsumableHistory
+
+
+def rebuild_daily_stats(db_session):
+    """Recompute the days of consumable_daily_stats that history covers.
+
+    Days without history are kept as they are: those of archived partitions,
+    and the quantities set without a movement. The closing quantity of a
+    recomputed day between two kept days is replayed forward from the first
+    one, and that of any other day back from the current quantity.
+    """
+    modified_count = ConsumableHistory.modified_count
+    day = cast(ConsumableHistory.modified_time, Date)
+    daily = (
+        select(
+            ConsumableHistory.consumable_id,
+            day.label("day"),
+            func.coalesce(func.sum(modified_count).filter(modified_count > 0), 0).label(
+                "inflow"
+            ),
+            func.coalesce(
+                -func.sum(modified_count).filter(modified_count < 0), 0
+            ).label("outflow"),
+            func.sum(modified_count).label("net"),
+            func.count().label("movement_count"),
+        )
+        .group_by(ConsumableHistory.consumable_id, day)
+        .cte("daily")
+    )
+    stats = ConsumableDailyStats
+    days = union_all(
+        select(
+            daily.c.consumable_id,
+            daily.c.day,
+            daily.c.inflow,
+            daily.c.outflow,
+            daily.c.net,
+            daily.c.movement_count,
+            null().label("kept_closing"),
+        ),
+        select(
+            stats.consumable_id,
+            stats.day,
+            stats.inflow,
+            stats.outflow,
+            literal(0),
+            stats.movement_count,
+            stats.closing_quantity,
+        ),
+    ).subquery("days")
+    # Each kept day starts a run of the recomputed days after it.
+    run = func.count(days.c.kept_closing).over(
+        partition_by=days.c.consumable_id, order_by=days.c.day
+    )
+    later = {
+        "partition_by": days.c.consumable_id,
+        "order_by": days.c.day.desc(),
+        "rows": (None, -1),
+    }
+    runs = select(
+        days,
+        run.label("run"),
+        func.count(days.c.kept_closing).over(**later).label("later_kept"),
+        func.sum(days.c.net).over(**later).label("later_net"),
+    ).subquery("runs")
+    run_window = {"partition_by": [runs.c.consumable_id, runs.c.run]}
+    closing = case(
+        (
+            (runs.c.run > 0) & (runs.c.later_kept > 0),
+            func.max(runs.c.kept_closing).over(**run_window)
+            + func.sum(runs.c.net).over(**run_window, order_by=runs.c.day),
+        ),
+        else_=Consumable.quantity - func.coalesce(runs.c.later_net, 0),
+    )
+    rebuilt = (
+        select(
+            runs.c.consumable_id,
+            runs.c.day,
+            runs.c.inflow,
+            runs.c.outflow,
+            runs.c.movement_count,
+            closing.label("closing_quantity"),
+            runs.c.kept_closing,
+        )
+        .join(Consumable, Consumable.consumable_id == runs.c.consumable_id)
+        .subquery("rebuilt")
+    )
+
+    # Movements recorded while the rebuild runs wait for this lock, so none
+    # of them is lost between the delete and the insert.
+    db_session.execute(text("LOCK TABLE consumable_daily_stats IN EXCLUSIVE MODE"))
+    db_session.execute(
+        delete(stats)
+        .where(stats.consumable_id == daily.c.consumable_id)
+        .where(stats.day == daily.c.day)
+    )
+    return db_session.execute(
+        insert(stats).from_select(
+            [
+                "consumable_id",
+                "day",
+                "inflow",
+                "outflow",
+                "movement_count",
+                "closing_quantity",
+            ],
+            select(
+                rebuilt.c.consumable_id,
+                rebuilt.c.day,
+                rebuilt.c.inflow,
+                rebuilt.c.outflow,
+                rebuilt.c.movement_count,
+                rebuilt.c.closing_quantity,
+            ).where(rebuilt.c.kept_closing.is_(None)),
+        )
+    ).rowcount
+
+
+def stock_at_query(at: datetime, consumables):
+    """Select the quantity of ``consumables`` as of ``at``.
+
+    ``consumables`` is a select of consumable ids. The quantity starts from
+    the closing quantity of the last day in the rollup up to the day of
+    ``at``, which also reflects quantities set without a movement, and takes
+    off the movements of the day of ``at`` after it. Consumables without
+    such a day are replayed back from their current quantity instead.
+    """
+    end_of_day = datetime.combine(at.date(), time()) + timedelta(days=1)
+    closing = (
+        select(ConsumableDailyStats.closing_quantity)
+        .where(ConsumableDailyStats.consumable_id == Consumable.consumable_id)
+        .where(ConsumableDailyStats.day <= at.date())
+        .order_by(ConsumableDailyStats.day.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    modified_count = ConsumableHistory.modified_count
+    today = (
+        select(
+            ConsumableHistory.consumable_id,
+            func.sum(modified_count).label("after_at"),
+        )
+        .where(ConsumableHistory.consumable_id.in_(consumables))
+        .where(ConsumableHistory.modified_time > at)
+        .where(ConsumableHistory.modified_time < end_of_day)
+        .group_by(ConsumableHistory.consumable_id)
+        .subquery("today")
+    )
+    later_days = (
+        select(
+            ConsumableDailyStats.consumable_id,
+            func.sum(ConsumableDailyStats.inflow - ConsumableDailyStats.outflow).label(
+                "net"
+            ),
+        )
+        .where(ConsumableDailyStats.consumable_id.in_(consumables))
+        .where(ConsumableDailyStats.day > at.date())
+        .group_by(ConsumableDailyStats.consumable_id)
+        .subquery("later_days")
+    )
+
+    return (
+        select(
+            Consumable.consumable_id,
+            (
+                func.coalesce(
+                    closing, Consumable.quantity - func.coalesce(later_days.c.net, 0)
+                )
+                - func.coalesce(today.c.after_at, 0)
+            ).label("quantity"),
+        )
+        .outerjoin(today, today.c.consumable_id == Consumable.consumable_id)
+        .outerjoin(later_days, later_days.c.consumable_id == Consumable.consumable_id)
+        .where(Consumable.consumable_id.in_(consumables))
+        .where(Consumable.created_at <= at.date())
+        .order_by(Consumable.consumable_id)
+    )
@@ -0,0 +1,35 @@
+import time
+
+import click
+
+from app.api.auth.helpers import delete_expired
+from app.core.database import session_maker
+from app.main import app
+from app.models.user import RevokedToken, UserSession
+
+
+@app.cli.command("reap-sessions")
+@click.option("--batch-size", default=1000, show_default=True, type=click.IntRange(1))
+@click.option(
+    "--pause",
+    default=0.1,
+    show_default=True,
+    type=click.FloatRange(0),
+    help="Seconds to sleep between batches.",
+)
+def reap_sessions_command(batch_size: int, pause: float):
+    """Delete the expired user sessions and revoked tokens.
+
+    Meant to run periodically, from cron for instance. Every batch is a short
+    transaction of its own, so that no lock is held for long.
+    """
+    with session_maker() as db_session:
+        for model in (UserSession, RevokedToken):
+            total = 0
+            while deleted := delete_expired(db_session, model, batch_size):
+                db_session.commit()
+                total += deleted
+                time.sleep(pause)
+            db_session.rollback()
+
+            click.echo(f"Deleted {total} expired {model.__tablename__} rows")
@@ -3,36 +3,69 @@ from datetime import datetime
 from flask import g, jsonify, make_response, request
 from flask_pydantic import validate
 from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import joinedload
 
 from app.api.auth.helpers import (
+    InvalidToken,
+    PasswordHasherBusy,
+    bearer_token,
+    cache_user_session,
     calc_expiration_at,
     calc_refresh_at,
     check_password,
+    get_cached_user_session,
     hash_password,
+    invalidate_user_session,
+    invalidate_user_sessions,
+    issue_token,
+    password_needs_rehash,
+    revoked_tokens,
     set_session_cookie,
+    token_expiration_at,
+    verify_token,
 )
-from app.core.database import session_maker
+from app.core.config import Config
+from app.core.database import request_session
+from app.core.profiling import timed
 from app.core.utils import uuidhex
 from app.main import app
-from app.models.user import LoginSchema, RegisterSchema, Role, User, UserSession
+from app.models.user import (
+    LoginSchema,
+    RegisterSchema,
+    RevokedToken,
+    Role,
+    User,
+    UserSession,
+)
+
+
+def password_hasher_busy():
+    response = make_response(jsonify({"error": "Service busy, try again"}), 503)
+    response.headers["Retry-After"] = "1"
+    return response
 
 
 @app.route("/auth/register", methods=["POST"])
 @validate()
 def api_register(body: RegisterSchema):
-    with session_maker() as db_session:
+    with request_session() as db_session:
         user = db_session.scalar(select(User).where(User.email == body.email))
         if user is not None:
             return jsonify({"error": "User already exists"}), 400
 
+        try:
+            hashed_password = hash_password(body.password)
+        except PasswordHasherBusy:
+            return password_hasher_busy()
+
         user = User(
             user_id=uuidhex(),
             email=body.email,
             first_name=body.first_name,
             last_name=body.last_name,
             middle_name=body.middle_name,
-            hashed_password=hash_password(body.password),
+            hashed_password=hashed_password,
             role=Role.WORKER,
         )
         session = UserSession(user_id=user.user_id, expiration_at=calc_expiration_at())
@@ -51,18 +84,19 @@ def api_register(body: RegisterSchema):
 @app.route("/auth/login", methods=["POST"])
 @validate()
 def api_login(body: LoginSchema):
-    with session_maker() as db_session:
-        user = db_session.scalar(select(User).where(User.email == body.email))
+    with request_session() as db_session:
+        try:
+            user = authenticate(db_session, body)
+        except PasswordHasherBusy:
+            return password_hasher_busy()
         if user is None:
             return jsonify({"error": "AuthEror"}), 401
 
-        if not check_password(body.password, user.hashed_password):
-            return jsonify({"error": "AuthEror"}), 401
-
         db_session.execute(
             delete(UserSession).where(UserSession.user_id == user.user_id)
         )
         db_session.flush()
+        invalidate_user_sessions(user.user_id)
 
         session = UserSession(user_id=user.user_id, expiration_at=calc_expiration_at())
         db_session.add(session)
@@ -82,11 +116,12 @@ def api_logout():
     if not session_id:
         return jsonify({"error": "AuthError"}), 401
 
-    with session_maker() as db_session:
+    with request_session() as db_session:
         db_session.execute(
             delete(UserSession).where(UserSession.session_id == session_id)
         )
         db_session.commit()
+    invalidate_user_session(session_id)
 
     response = make_response(jsonify({"message": "Logged out"}), 200)
     response.delete_cookie("X-Session-ID")
@@ -94,23 +129,118 @@ def api_logout():
     return response
 
 
+@app.route("/auth/token", methods=["POST"])
+@validate()
+def api_issue_token(body: LoginSchema):
+    if not Config.SIGNED_TOKENS:
+        return jsonify({"error": "Signed tokens are disabled"}), 404
+
+    with request_session() as db_session:
+        try:
+            user = authenticate(db_session, body)
+        except PasswordHasherBusy:
+            return password_hasher_busy()
+        if user is None:
+            return jsonify({"error": "AuthEror"}), 401
+
+        # Only persists a rehashed password, no session row is written.
+        db_session.commit()
+
+    token, expiration_at = issue_token(user)
+    return jsonify(
+        {"token": token, "token_type": "Bearer", "expiration_at": expiration_at}
+    )
+
+
+@app.route("/auth/token/revoke", methods=["POST"])
+def api_revoke_token():
+    token = bearer_token(request)
+    if not Config.SIGNED_TOKENS or token is None:
+        return jsonify({"error": "AuthError"}), 401
+
+    try:
+        claims = verify_token(token)
+    except InvalidToken:
+        return jsonify({"error": "AuthError"}), 401
+
+    with request_session() as db_session:
+        db_session.execute(
+            insert(RevokedToken)
+            .values(token_id=claims["jti"], expiration_at=token_expiration_at(claims))
+            .on_conflict_do_nothing()
+        )
+        db_session.commit()
+    revoked_tokens.add(claims["jti"], token_expiration_at(claims))
+
+    return jsonify({"message": "Token revoked"})
+
+
 @app.before_request
+@timed("auth")
 def current_user():
-    if request.path.startswith("/auth"):
+    if request.path.startswith("/auth") or request.path == "/metrics":
         return None
 
+    token = bearer_token(request)
+    if Config.SIGNED_TOKENS and token is not None:
+        return current_token_user(token)
+
     session_id = request.cookies.get("X-Session-ID")
     if not session_id:
         return jsonify({"error": "Unauthorized"}), 401
 
-    with session_maker() as db_session:
+    session = get_cached_user_session(session_id)
+    if session is None:
+        session = load_user_session(session_id)
+        if session is None:
+            return jsonify({"error": "Unauthorized"}), 401
+
+    user = session.user
+
+    if request.method in ["POST", "PUT", "DELETE"] and user.role != Role.ADMIN:
+        return jsonify({"error": "Forbidden"}), 403
+
+    g.user = user
+
+
+def current_token_user(token: str):
+    try:
+        claims = verify_token(token)
+    except InvalidToken:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    role = Role(claims["role"])
+    if request.method in ["POST", "PUT", "DELETE"] and role != Role.ADMIN:
+        return jsonify({"error": "Forbidden"}), 403
+
+    # Built from the claims alone, the user is not loaded from the database.
+    g.user = User(user_id=claims["sub"], role=role)
+
+
+def authenticate(db_session, body: LoginSchema):
+    """Return the user with the credentials of ``body``, or ``None``.
+
+    Upgrades the stored hash of the password if needed. Raises
+    PasswordHasherBusy.
+    """
+    user = db_session.scalar(select(User).where(User.email == body.email))
+    if user is None or not check_password(body.password, user.hashed_password):
+        return None
+
+    if password_needs_rehash(user.hashed_password):
+        user.hashed_password = hash_password(body.password)
+    return user
+
+
+def load_user_session(session_id: str):
+    with request_session() as db_session:
         session = db_session.scalar(
             select(UserSession)
             .options(joinedload(UserSession.user))
             .where(UserSession.session_id == session_id)
         )
         if session is None or session.user is None:
-            return jsonify({"error": "Unauthorized"}), 401
+            return None
 
         user = session.user
 
@@ -119,26 +249,30 @@ def current_user():
                 delete(UserSession).where(UserSession.session_id == session_id)
             )
             db_session.commit()
-            return jsonify({"error": "Unauthorized"}), 401
+            return None
 
         if calc_refresh_at(session.created_at) <= datetime.utcnow():
             db_session.execute(
                 delete(UserSession).where(UserSession.session_id == session_id)
             )
             db_session.flush()
+            invalidate_user_session(session_id)
 
             session = UserSession(
-                user_id=user.user_id, expiration_at=calc_expiration_at()
+                user_id=user.user_id, user=user, expiration_at=calc_expiration_at()
             )
             db_session.add(session)
             db_session.commit()
 
             g.user_session = session
-
-        if request.method in ["POST", "PUT", "DELETE"] and user.role != Role.ADMIN:
-            return jsonify({"error": "Forbidden"}), 403
-
-        g.user = user
+            return session
+
+        # Cached sessions outlive this request, detach them so that a rollback
+        # here cannot expire them under other requests.
+        db_session.expunge(session)
+        db_session.expunge(user)
+        cache_user_session(session)
+        return session
 
 
 @app.after_request
@@ -1,22 +1,152 @@
 import base64
 import hashlib
+import hmac
+import json
+import logging
+import multiprocessing
 import os
-from datetime import datetime, timedelta
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import UTC, datetime, timedelta
 
+from sqlalchemy import delete, event, func, inspect, select
+from sqlalchemy.orm.attributes import NEVER_SET, NO_VALUE
+
+from app.core.cache import TTLCache
 from app.core.config import Config
+from app.core.database import session_maker
+from app.core.metrics import registry
+from app.core.utils import uuidhex
+from app.models.user import RevokedToken, User, UserSession
+
+logger = logging.getLogger(__name__)
+
+user_session_cache = TTLCache(
+    Config.USER_SESSION_CACHE_SIZE, Config.USER_SESSION_CACHE_TTL
+)
+user_sessions = registry.gauge(
+    "user_sessions", "User sessions in the database.", ("state",)
+)
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+class InvalidToken(Exception):
+    pass
+
+
+LEGACY_HASH_ITERATIONS = 100000
+
+password_hash_slots = threading.BoundedSemaphore(Config.PASSWORD_HASH_CONCURRENCY)
+password_hash_pool = None
+password_hash_pool_lock = threading.Lock()
+
+
+def pbkdf2(digest: str, raw_password: str, salt: bytes, iterations: int) -> bytes:
+    return hashlib.pbkdf2_hmac(digest, raw_password.encode(), salt, iterations)
+
+
+def get_password_hash_pool():
+    global password_hash_pool
+    with password_hash_pool_lock:
+        # Created lazily so that each gunicorn worker gets its own pool after
+        # the fork.
+        if password_hash_pool is None:
+            # The worker runs threads by then, and forking a threaded process
+            # can leave a lock held forever in the child.
+            password_hash_pool = ProcessPoolExecutor(
+                Config.PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+        return password_hash_pool
+
+
+def reset_password_hash_pool(pool):
+    """Drop ``pool`` if it is still the current one, to recreate it on next use."""
+    global password_hash_pool
+    with password_hash_pool_lock:
+        if password_hash_pool is pool:
+            password_hash_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def run_pbkdf2(digest: str, raw_password: str, salt: bytes, iterations: int):
+    """Derive a key on the password hashing pool.
+
+    At most PASSWORD_HASH_CONCURRENCY hashes per worker are running or queued
+    at once; a request that cannot get a slot within
+    PASSWORD_HASH_QUEUE_TIMEOUT seconds raises PasswordHasherBusy.
+    """
+    if not password_hash_slots.acquire(timeout=Config.PASSWORD_HASH_QUEUE_TIMEOUT):
+        raise PasswordHasherBusy
+
+    try:
+        if not Config.PASSWORD_HASH_WORKERS:
+            return pbkdf2(digest, raw_password, salt, iterations)
+        pool = get_password_hash_pool()
+        try:
+            return pool.submit(pbkdf2, digest, raw_password, salt, iterations).result()
+        except BrokenProcessPool:
+            # A killed child breaks the pool for good.
+            reset_password_hash_pool(pool)
+            raise
+    finally:
+        password_hash_slots.release()
+
+
+def parse_password_hash(hashed_password: str):
+    """Split a stored hash into (digest, iterations, salt, key).
+
+    Hashes look like ``pbkdf2_<digest>$<iterations>$<salt>$<key>``; values
+    without a ``$`` are the original base64(salt + key) format hashed with
+    100000 rounds of SHA-256.
+    """
+    if "$" not in hashed_password:
+        decoded = base64.b64decode(hashed_password.encode())
+        salt, key = decoded[: Config.SALT_SIZE], decoded[Config.SALT_SIZE :]
+        return "sha256", LEGACY_HASH_ITERATIONS, salt, key
+
+    algorithm, iterations, salt, key = hashed_password.split("$")
+    return (
+        algorithm.removeprefix("pbkdf2_"),
+        int(iterations),
+        base64.b64decode(salt),
+        base64.b64decode(key),
+    )
 
 
 def hash_password(raw_password: str) -> str:
     salt = os.urandom(Config.SALT_SIZE)
-    key = hashlib.pbkdf2_hmac("sha256", raw_password.encode(), salt, 100000)
-    return base64.b64encode(salt + key).decode()
+    digest, iterations = Config.PASSWORD_HASH_DIGEST, Config.PASSWORD_HASH_ITERATIONS
+    key = run_pbkdf2(digest, raw_password, salt, iterations)
+    return "$".join(
+        [
+            f"pbkdf2_{digest}",
+            str(iterations),
+            base64.b64encode(salt).decode(),
+            base64.b64encode(key).decode(),
+        ]
+    )
 
 
 def check_password(raw_password: str, hashed_password: str) -> bool:
-    decoded = base64.b64decode(hashed_password.encode())
-    salt, key = decoded[: Config.SALT_SIZE], decoded[Config.SALT_SIZE :]
-    new_key = hashlib.pbkdf2_hmac("sha256", raw_password.encode(), salt, 100000)
-    return key == new_key
+    digest, iterations, salt, key = parse_password_hash(hashed_password)
+    new_key = run_pbkdf2(digest, raw_password, salt, iterations)
+    return hmac.compare_digest(key, new_key)
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    digest, iterations, salt, _ = parse_password_hash(hashed_password)
+    return (
+        "$" not in hashed_password
+        or digest != Config.PASSWORD_HASH_DIGEST
+        or iterations != Config.PASSWORD_HASH_ITERATIONS
+        or len(salt) != Config.SALT_SIZE
+    )
 
 
 def calc_expiration_at():
@@ -35,3 +165,220 @@ def set_session_cookie(response, session):
         samesite="Strict",
         expires=session.expiration_at,
     )
+
+
+def cache_user_session(session):
+    valid_until = min(session.expiration_at, calc_refresh_at(session.created_at))
+    ttl = (valid_until - datetime.utcnow()).total_seconds()
+    user_session_cache.set(session.session_id, session, ttl)
+
+
+def get_cached_user_session(session_id: str):
+    return user_session_cache.get(session_id)
+
+
+def invalidate_user_session(session_id: str):
+    user_session_cache.delete(session_id)
+
+
+def invalidate_user_sessions(user_id: str):
+    user_session_cache.delete_where(lambda session: session.user_id == user_id)
+
+
+@event.listens_for(User.role, "set", active_history=True)
+def invalidate_on_role_change(user, value, old_value, initiator):
+    if old_value not in (NO_VALUE, NEVER_SET) and value != old_value:
+        invalidate_user_sessions(user.user_id)
+
+
+class RevokedTokens:
+    """Ids of the revoked signed tokens that have not expired yet.
+
+    Every worker holds the whole list in memory, which stays small because
+    the tokens are short-lived, and a thread reloads it from the
+    revoked_tokens table every REVOKED_TOKENS_REFRESH seconds. A token revoked
+    through another worker is thus still accepted here for up to that long.
+    """
+
+    def __init__(self):
+        self._token_ids = frozenset()
+        # Revoked here but not seen in a reload yet, by expiry.
+        self._added = {}
+        self._poller = None
+        self._start_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+    def add(self, token_id: str, expiration_at: datetime):
+        with self._lock:
+            self._added[token_id] = expiration_at
+            self._token_ids = self._token_ids | {token_id}
+
+    def __contains__(self, token_id: str) -> bool:
+        if self._poller is None:
+            # Only outside gunicorn, whose workers start it when forked.
+            self.start()
+        return token_id in self._token_ids
+
+    def start(self):
+        """Load the list and keep it up to date from a thread.
+
+        Must run in the process that serves the requests: a thread started
+        before a fork does not exist in the child.
+        """
+        with self._start_lock:
+            if self._poller is not None:
+                return
+            self.refresh()
+            self._poller = threading.Thread(
+                target=self.poll, name="revoked-tokens", daemon=True
+            )
+            self._poller.start()
+
+    def poll(self):
+        while True:
+            time.sleep(Config.REVOKED_TOKENS_REFRESH)
+            self.refresh()
+
+    def refresh(self):
+        try:
+            with session_maker() as db_session:
+                token_ids = set(
+                    db_session.scalars(
+                        select(RevokedToken.token_id).where(
+                            RevokedToken.expiration_at > datetime.utcnow()
+                        )
+                    )
+                )
+        except Exception:
+            logger.exception("Could not load the revoked tokens")
+            return
+
+        with self._lock:
+            # A token revoked here while the query ran may be missing from
+            # its result, so it is kept until a reload sees it.
+            now = datetime.utcnow()
+            self._added = {
+                token_id: expiration_at
+                for token_id, expiration_at in self._added.items()
+                if token_id not in token_ids and expiration_at > now
+            }
+            self._token_ids = frozenset(token_ids | self._added.keys())
+
+
+revoked_tokens = RevokedTokens()
+
+
+def encode_token_part(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def decode_token_part(part: str) -> bytes:
+    return base64.urlsafe_b64decode(part + "=" * (-len(part) % 4))
+
+
+def sign_token(payload: bytes) -> bytes:
+    return hmac.new(Config.SECRET_KEY.encode(), payload, hashlib.sha256).digest()
+
+
+def issue_token(user) -> tuple[str, datetime]:
+    """Sign a bearer token for ``user`` and return it with its expiry.
+
+    The token carries the user id and role, so a role change only applies
+    to the tokens issued after it; SIGNED_TOKEN_EXPIRY bounds how long.
+    """
+    expiration_at = datetime.utcnow() + timedelta(seconds=Config.SIGNED_TOKEN_EXPIRY)
+    payload = json.dumps(
+        {
+            "jti": uuidhex(),
+            "sub": user.user_id,
+            "role": user.role.value,
+            "exp": int(expiration_at.replace(tzinfo=UTC).timestamp()),
+        },
+        separators=(",", ":"),
+    ).encode()
+    token = f"{encode_token_part(payload)}.{encode_token_part(sign_token(payload))}"
+    return token, expiration_at
+
+
+def verify_token(token: str) -> dict:
+    """Return the claims of a signed token.
+
+    Raises InvalidToken if the token is malformed, forged, expired or
+    revoked.
+    """
+    try:
+        payload, signature = map(decode_token_part, token.split("."))
+    except ValueError as error:
+        raise InvalidToken from error
+
+    if not hmac.compare_digest(signature, sign_token(payload)):
+        raise InvalidToken
+
+    claims = json.loads(payload)
+    if claims["exp"] <= time.time() or claims["jti"] in revoked_tokens:
+        raise InvalidToken
+    return claims
+
+
+def token_expiration_at(claims: dict) -> datetime:
+    return datetime.fromtimestamp(claims["exp"], UTC).replace(tzinfo=None)
+
+
+def bearer_token(request) -> str | None:
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    return token
+
+
+user_session_counts = TTLCache(1, Config.USER_SESSION_COUNT_TTL)
+user_session_counts_lock = threading.Lock()
+
+
+def count_user_sessions() -> dict:
+    """Count the active and expired user sessions.
+
+    /metrics is public, so the counts are cached for USER_SESSION_COUNT_TTL
+    seconds and computed by one scrape at a time: scraping it cannot scan
+    the table more often than that.
+    """
+    with user_session_counts_lock:
+        counts = user_session_counts.get("counts")
+        if counts is None:
+            with session_maker() as db_session:
+                expired, total = db_session.execute(
+                    select(
+                        func.count().filter(
+                            UserSession.expiration_at <= datetime.utcnow()
+                        ),
+                        func.count(),
+                    ).select_from(UserSession)
+                ).one()
+            counts = {("active",): total - expired, ("expired",): expired}
+            user_session_counts.set("counts", counts)
+        return counts
+
+
+user_sessions.set_function(count_user_sessions)
+
+
+def delete_expired(db_session, model, batch_size: int) -> int:
+    """Delete up to ``batch_size`` expired rows of ``model``.
+
+    The rows are found through the ``expiration_at`` index. Rows locked by a
+    concurrent transaction, like a login replacing the sessions of its user,
+    are skipped rather than waited for. Returns the number of deleted rows.
+    """
+    (key,) = inspect(model).primary_key
+    expired = (
+        select(key)
+        .where(model.expiration_at <= datetime.utcnow())
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    result = db_session.execute(
+        delete(model)
+        .where(key.in_(expired.scalar_subquery()))
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
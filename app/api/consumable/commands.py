@@ -0,0 +1,101 @@
+import contextlib
+import gzip
+import os
+from datetime import datetime
+
+import click
+
+from app.api.consumable.helpers import (
+    create_history_partitions,
+    detach_history_partition,
+    detached_history_partitions,
+    drop_history_partition,
+    dump_history_partition,
+    history_partitions,
+)
+from app.core.config import Config
+from app.core.database import session_maker
+from app.main import app
+
+
+@app.cli.group("history-partitions")
+def history_partitions_command():
+    """Manage the monthly partitions of consumable_history."""
+
+
+@history_partitions_command.command("create")
+@click.option(
+    "--months-ahead",
+    default=Config.HISTORY_PARTITION_MONTHS_AHEAD,
+    show_default=True,
+    type=click.IntRange(0),
+)
+def create_history_partitions_command(months_ahead: int):
+    """Create the partitions for the current and upcoming months.
+
+    gunicorn runs this when it starts. A server that may run for longer than
+    HISTORY_PARTITION_MONTHS_AHEAD months without a restart needs it
+    scheduled as well, e.g. monthly from cron, since a month's partition
+    cannot be created once its rows have landed in the default one.
+    """
+    with session_maker() as db_session:
+        created = create_history_partitions(db_session, months_ahead)
+        db_session.commit()
+
+    for name in created:
+        click.echo(f"Created {name}")
+    click.echo(f"Created {len(created)} partitions")
+
+
+@history_partitions_command.command("archive")
+@click.option(
+    "--before",
+    required=True,
+    type=click.DateTime(["%Y-%m"]),
+    help="Archive the partitions of the months before this one.",
+)
+@click.option(
+    "--directory",
+    required=True,
+    type=click.Path(file_okay=False, writable=True),
+    help="Directory to write the gzipped CSV dumps to.",
+)
+def archive_history_partitions_command(before: datetime, directory: str):
+    """Move old history partitions out of the database.
+
+    Archived movements stay in consumable_daily_stats, and rebuild-daily-stats
+    keeps the days it no longer has the history of.
+    """
+    os.makedirs(directory, exist_ok=True)
+    before = before.date().replace(day=1)
+    with session_maker() as db_session:
+        for month, name in sorted(history_partitions(db_session).items()):
+            if month < before:
+                # Committed on its own, as the detach blocks every read and
+                # write of consumable_history until then.
+                detach_history_partition(db_session, name)
+                db_session.commit()
+
+        # Also picks up the partitions a failed run detached but did not drop.
+        names = [
+            name
+            for month, name in sorted(detached_history_partitions(db_session).items())
+            if month < before
+        ]
+        for name in names:
+            path = os.path.join(directory, f"{name}.csv.gz")
+            try:
+                with gzip.open(path, "wb") as file:
+                    dump_history_partition(db_session, name, file)
+            except BaseException:
+                # Not left behind to be mistaken for a complete dump.
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(path)
+                raise
+            db_session.commit()
+
+            drop_history_partition(db_session, name)
+            db_session.commit()
+            click.echo(f"Archived {name} to {path}")
+
+    click.echo(f"Archived {len(names)} partitions")
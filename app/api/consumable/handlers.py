@@ -1,23 +1,80 @@
-from flask import jsonify
+import json
+import operator
+
+from flask import Response, jsonify, request, stream_with_context
 from flask_pydantic import validate
+from pydantic import TypeAdapter
 from sqlalchemy import select
-
-from app.core.database import session_maker
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app.api.consumable.helpers import (
+    opening_daily_stats,
+    parse_embed,
+    record_daily_stats,
+    record_movement,
+    record_movements,
+    remove_daily_stats,
+    represent_consumables,
+    set_quantity_rows,
+    stream_csv,
+    stream_ndjson,
+    update_stock_alerts,
+    upsert_consumables,
+)
+from app.core.config import Config
+from app.core.database import request_session
+from app.core.etag import make_etag, not_modified, with_etag
+from app.core.events import publish_event
+from app.core.filters import apply_filters, has_direction, sort_keys, starts_with
+from app.core.pagination import paginate
+from app.core.profiling import streaming
+from app.core.response_cache import cached, invalidate_cache
+from app.core.upsert import summarize_upsert
 from app.main import app
 from app.models.consumable import (
     Consumable,
     ConsumableCategory,
     ConsumableHistory,
-    GETListParams,
+    GETConsumableListParams,
+    GETEmbedParams,
+    GETHistoryExportParams,
+    GETHistoryListParams,
+    POSTBatchParams,
     POSTConsumable,
     POSTConsumableHistory,
+    POSTConsumableMovement,
 )
 
+movements_adapter = TypeAdapter(list[POSTConsumableMovement])
+
+CONSUMABLE_FILTERS = {
+    "name_prefix": (Consumable.name, starts_with),
+    "quantity_min": (Consumable.quantity, operator.ge),
+    "quantity_max": (Consumable.quantity, operator.le),
+    "created_since": (Consumable.created_at, operator.ge),
+    "created_until": (Consumable.created_at, operator.le),
+}
+CONSUMABLE_SORTS = {
+    "consumable_id": Consumable.consumable_id,
+    "name": Consumable.name,
+    "quantity": Consumable.quantity,
+    "created_at": Consumable.created_at,
+}
+HISTORY_FILTERS = {
+    "since": (ConsumableHistory.modified_time, operator.ge),
+    "until": (ConsumableHistory.modified_time, operator.lt),
+    "direction": (ConsumableHistory.modified_count, has_direction),
+}
+HISTORY_SORTS = {
+    "history_id": ConsumableHistory.history_id,
+    "modified_time": ConsumableHistory.modified_time,
+}
+
 
 @app.post("/categories/<category_id>/consumables")
 @validate()
 def api_add_consumable(category_id: str, body: POSTConsumable):
-    with session_maker() as db_session:
+    with request_session() as db_session:
         category = db_session.scalar(
             select(ConsumableCategory).where(
                 ConsumableCategory.category_id == category_id
@@ -35,65 +92,205 @@ def api_add_consumable(category_id: str, body: POSTConsumable):
         consumable = Consumable(
             name=body.name,
             quantity=body.quantity,
+            min_quantity=body.min_quantity,
             description=body.description,
             category_id=category_id,
         )
         db_session.add(consumable)
-        db_session.commit()
+        invalidate_cache(db_session, f"consumables:{category_id}")
+        try:
+            db_session.flush()
+            record_daily_stats(
+                db_session,
+                [opening_daily_stats(consumable.consumable_id, consumable.quantity)],
+            )
+            update_stock_alerts(
+                db_session,
+                [
+                    {
+                        "consumable_id": consumable.consumable_id,
+                        "category_id": category_id,
+                        "quantity": body.quantity,
+                        "min_quantity": body.min_quantity,
+                    }
+                ],
+            )
+            db_session.commit()
+        except IntegrityError:
+            db_session.rollback()
+            return jsonify({"error": "Consumable already exists"}), 400
 
         return jsonify({"consumable": consumable.to_dict()}), 201
 
 
-@app.get("/categories/<category_id>/consumables")
-@validate()
-def api_get_consumables(category_id: str, query: GETListParams):
-    with session_maker() as db_session:
-        sql_query = (
-            select(Consumable)
-            .where(Consumable.category_id == category_id)
-            .offset(query.offset)
+@app.post("/categories/<category_id>/consumables/batch")
+@validate(body=POSTConsumable, request_body_many=True)
+def api_add_consumables_batch(category_id: str, query: POSTBatchParams):
+    with request_session() as db_session:
+        category = db_session.scalar(
+            select(ConsumableCategory).where(
+                ConsumableCategory.category_id == category_id
+            )
+        )
+        if category is None:
+            return jsonify({"error": "Category does not exist"}), 404
+
+        results = upsert_consumables(
+            db_session,
+            category_id,
+            request.body_params,
+            query.on_conflict == "update",
+        )
+        invalidate_cache(
+            db_session,
+            f"consumables:{category_id}",
+            *[
+                f"consumable:{result['consumable_id']}"
+                for result in results
+                if result["status"] == "updated"
+            ],
         )
-        if query.limit:
-            sql_query = sql_query.limit(query.limit)
+        db_session.commit()
 
-        consumables = db_session.scalars(sql_query)
+    return jsonify(summarize_upsert(results))
 
-        return jsonify(
-            {"consumables": [consumable.to_dict() for consumable in consumables]}
+
+@app.get("/categories/<category_id>/consumables")
+@cached("consumables:{category_id}")
+@validate()
+def api_get_consumables(category_id: str, query: GETConsumableListParams):
+    try:
+        include, fields = parse_embed(query, ("history",))
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
+    with request_session() as db_session:
+        sql_query = apply_filters(
+            select(*Consumable.json_columns()).where(
+                Consumable.category_id == category_id
+            ),
+            query,
+            CONSUMABLE_FILTERS,
         )
+        try:
+            consumables, next_cursor = paginate(
+                db_session,
+                sql_query,
+                sort_keys(query.sort, CONSUMABLE_SORTS, Consumable.consumable_id),
+                query,
+            )
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+
+        representations, fingerprint = represent_consumables(
+            db_session,
+            consumables,
+            fields,
+            query.history_limit if "history" in include else None,
+        )
+
+    etag = make_etag(fingerprint, next_cursor)
+    return not_modified(etag) or with_etag(
+        jsonify(
+            {
+                "consumables": representations,
+                "next_cursor": next_cursor,
+            }
+        ),
+        etag,
+    )
 
 
 @app.get("/categories/<category_id>/consumables/<consumable_id>")
+@cached("consumable:{consumable_id}")
 @validate()
-def api_get_consumable(category_id: str, consumable_id: str):
-    with session_maker() as db_session:
-        consumable = db_session.scalar(
-            select(Consumable)
+def api_get_consumable(category_id: str, consumable_id: str, query: GETEmbedParams):
+    try:
+        include, fields = parse_embed(query, ("history",))
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
+    with request_session() as db_session:
+        consumable = db_session.execute(
+            select(*Consumable.json_columns())
             .where(Consumable.category_id == category_id)
             .where(Consumable.consumable_id == consumable_id)
-        )
+        ).one_or_none()
         if consumable is None:
             return jsonify({"error": "Consumable not found"}), 404
 
-        return jsonify({"consumable": consumable.to_dict()})
+        representations, fingerprint = represent_consumables(
+            db_session,
+            [consumable],
+            fields,
+            query.history_limit if "history" in include else None,
+        )
+
+    etag = make_etag(fingerprint)
+    return not_modified(etag) or with_etag(
+        jsonify({"consumable": representations[0]}), etag
+    )
 
 
 @app.put("/categories/<category_id>/consumables/<consumable_id>")
 @validate()
 def api_update_consumable(category_id: str, consumable_id: str, body: POSTConsumable):
-    with session_maker() as db_session:
+    with request_session() as db_session:
         consumable = db_session.scalar(
             select(Consumable)
             .where(Consumable.category_id == category_id)
             .where(Consumable.consumable_id == consumable_id)
+            # Locked until the commit, so that the logged difference is the
+            # one the update applies.
+            .with_for_update()
         )
         if consumable is None:
             return jsonify({"error": "Consumable not found"}), 404
 
+        history_row, stats = set_quantity_rows(
+            consumable_id, consumable.quantity, body.quantity, "Set by update"
+        )
         consumable.name = body.name
         consumable.quantity = body.quantity
+        consumable.min_quantity = body.min_quantity
         consumable.description = body.description
-        db_session.commit()
+        consumable.version = Consumable.version + 1
+        try:
+            db_session.flush()
+            invalidate_cache(
+                db_session,
+                f"consumables:{category_id}",
+                f"consumable:{consumable_id}",
+            )
+            publish_event(
+                db_session,
+                {
+                    "type": "consumable.updated",
+                    "consumable_id": consumable_id,
+                    "category_id": category_id,
+                    "quantity": body.quantity,
+                },
+            )
+            if history_row is not None:
+                db_session.add(ConsumableHistory(**history_row))
+            record_daily_stats(db_session, [stats])
+            # The quantity is set rather than moved, so the alert follows the
+            # new state whatever the old one was.
+            update_stock_alerts(
+                db_session,
+                [
+                    {
+                        "consumable_id": consumable_id,
+                        "category_id": category_id,
+                        "quantity": body.quantity,
+                        "min_quantity": body.min_quantity,
+                    }
+                ],
+            )
+            db_session.commit()
+        except IntegrityError:
+            db_session.rollback()
+            return jsonify({"error": "Consumable already exists"}), 400
 
         return jsonify({"consumable": consumable.to_dict()})
 
@@ -101,7 +298,7 @@ def api_update_consumable(category_id: str, consumable_id: str, body: POSTConsum
 @app.delete("/categories/<category_id>/consumables/<consumable_id>")
 @validate()
 def api_delete_consumable(category_id: str, consumable_id: str):
-    with session_maker() as db_session:
+    with request_session() as db_session:
         consumable = db_session.scalar(
             select(Consumable)
             .where(Consumable.category_id == category_id)
@@ -111,6 +308,17 @@ def api_delete_consumable(category_id: str, consumable_id: str):
             return jsonify({"error": "Consumable not found"}), 404
 
         db_session.delete(consumable)
+        invalidate_cache(
+            db_session, f"consumables:{category_id}", f"consumable:{consumable_id}"
+        )
+        publish_event(
+            db_session,
+            {
+                "type": "consumable.deleted",
+                "consumable_id": consumable_id,
+                "category_id": category_id,
+            },
+        )
         db_session.commit()
 
         return jsonify({"message": "Consumable deleted"})
@@ -121,49 +329,126 @@ def api_delete_consumable(category_id: str, consumable_id: str):
 def api_add_consumable_history(
     category_id: str, consumable_id: str, body: POSTConsumableHistory
 ):
-    with session_maker() as db_session:
-        consumable = db_session.scalar(
-            select(Consumable)
-            .where(Consumable.category_id == category_id)
-            .where(Consumable.consumable_id == consumable_id)
-        )
-        if consumable is None:
+    with request_session() as db_session:
+        try:
+            movement = record_movement(
+                db_session,
+                category_id,
+                consumable_id,
+                body.modified_count,
+                body.description,
+            )
+            if movement is not None:
+                invalidate_cache(
+                    db_session,
+                    f"consumables:{category_id}",
+                    f"consumable:{consumable_id}",
+                )
+                publish_event(
+                    db_session,
+                    {
+                        "type": "consumable.movement",
+                        "consumable_id": consumable_id,
+                        "category_id": category_id,
+                        "quantity": movement[1],
+                    },
+                )
+            db_session.commit()
+        except IntegrityError:
+            db_session.rollback()
+            return jsonify({"error": "Not enough quantity"}), 409
+        except DataError:
+            db_session.rollback()
+            return jsonify({"error": "Quantity out of range"}), 400
+
+        if movement is None:
             return jsonify({"error": "Consumable not found"}), 404
 
-        consumable.quantity += body.modified_count
-
-        history = ConsumableHistory(
-            modified_count=body.modified_count,
-            description=body.description,
-            consumable_id=consumable_id,
-        )
-        db_session.add(history)
-        db_session.commit()
-
-        return jsonify({"history": [history.to_dict()]})
+        history, quantity = movement
+        return jsonify({"history": [history.to_dict()], "quantity": quantity})
 
 
 @app.get("/categories/<category_id>/consumables/<consumable_id>/history")
 @validate()
 def api_get_consumable_history(
-    category_id: str, consumable_id: str, query: GETListParams
+    category_id: str, consumable_id: str, query: GETHistoryListParams
 ):
-    with session_maker() as db_session:
-        sql_query = (
-            select(ConsumableHistory)
-            .join(Consumable, ConsumableHistory.consumable_id == Consumable.consumable_id)
+    with request_session() as db_session:
+        # The history is partitioned by modified_time, so a time range limits
+        # the scan to the partitions it overlaps.
+        sql_query = apply_filters(
+            select(*ConsumableHistory.json_columns())
+            .join(
+                Consumable, ConsumableHistory.consumable_id == Consumable.consumable_id
+            )
             .where(ConsumableHistory.consumable_id == consumable_id)
+            .where(Consumable.category_id == category_id),
+            query,
+            HISTORY_FILTERS,
+        )
+        try:
+            history, next_cursor = paginate(
+                db_session,
+                sql_query,
+                sort_keys(query.sort, HISTORY_SORTS, ConsumableHistory.history_id),
+                query,
+            )
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+
+        return jsonify(
+            {
+                "history": history,
+                "next_cursor": next_cursor,
+            }
+        )
+
+
+@app.get("/categories/<category_id>/consumables/<consumable_id>/history/export")
+@streaming
+@validate()
+def api_export_consumable_history(
+    category_id: str, consumable_id: str, query: GETHistoryExportParams
+):
+    with request_session() as db_session:
+        consumable_id = db_session.scalar(
+            select(Consumable.consumable_id)
             .where(Consumable.category_id == category_id)
-            .offset(query.offset)
+            .where(Consumable.consumable_id == consumable_id)
         )
-        if query.limit:
-            sql_query = sql_query.limit(query.limit)
+        if consumable_id is None:
+            return jsonify({"error": "Consumable not found"}), 404
 
-        history = db_session.scalars(
-            sql_query.order_by(ConsumableHistory.history_id.desc())
+        sql_query = (
+            select(*ConsumableHistory.json_columns())
+            .where(ConsumableHistory.consumable_id == consumable_id)
+            .order_by(ConsumableHistory.history_id)
+        )
+        if query.since:
+            sql_query = sql_query.where(ConsumableHistory.modified_time >= query.since)
+        if query.until:
+            sql_query = sql_query.where(ConsumableHistory.modified_time < query.until)
+
+        # yield_per streams the rows through a server-side cursor, so memory
+        # use does not depend on the size of the export.
+        result = db_session.execute(
+            sql_query.execution_options(yield_per=Config.HISTORY_EXPORT_BATCH_SIZE)
         )
 
-        return jsonify({"history": [item.to_dict() for item in history]})
+    if query.format == "csv":
+        body, mimetype = stream_csv(result), "text/csv"
+    else:
+        body, mimetype = stream_ndjson(result, app.json.dumps), "application/x-ndjson"
+
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": (
+                f"attachment; filename=history-{consumable_id}.{query.format}"
+            )
+        },
+    )
 
 
 @app.delete(
@@ -173,10 +458,12 @@ def api_get_consumable_history(
 def api_delete_consumable_history(
     category_id: str, consumable_id: str, history_id: int
 ):
-    with session_maker() as db_session:
+    with request_session() as db_session:
         history = db_session.scalar(
             select(ConsumableHistory)
-            .join(Consumable, ConsumableHistory.consumable_id == Consumable.consumable_id)
+            .join(
+                Consumable, ConsumableHistory.consumable_id == Consumable.consumable_id
+            )
             .where(ConsumableHistory.consumable_id == consumable_id)
             .where(Consumable.category_id == category_id)
             .where(ConsumableHistory.history_id == history_id)
@@ -185,6 +472,56 @@ def api_delete_consumable_history(
             return jsonify({"error": "History item not found"}), 404
 
         db_session.delete(history)
+        remove_daily_stats(db_session, history)
+        # Embedded in the consumable representations.
+        invalidate_cache(
+            db_session, f"consumables:{category_id}", f"consumable:{consumable_id}"
+        )
+        publish_event(
+            db_session,
+            {
+                "type": "history.deleted",
+                "consumable_id": consumable_id,
+                "category_id": category_id,
+                "history_id": history.history_id,
+            },
+        )
         db_session.commit()
 
         return jsonify({"message": "History item deleted"})
+
+
+@app.post("/history/batch")
+def api_add_consumable_history_batch():
+    try:
+        if request.mimetype == "application/x-ndjson":
+            items = [
+                json.loads(line) for line in request.get_data().splitlines() if line
+            ]
+        else:
+            items = request.get_json(silent=True)
+        movements = movements_adapter.validate_python(items)
+    except ValueError:
+        return jsonify({"error": "Invalid movements"}), 400
+
+    if not movements:
+        return jsonify({"results": [], "applied": 0, "rejected": 0})
+    if len(movements) > Config.MOVEMENT_BATCH_MAX_SIZE:
+        return jsonify({"error": "Too many movements"}), 413
+
+    with request_session() as db_session:
+        try:
+            results = record_movements(db_session, movements)
+            db_session.commit()
+        except DataError:
+            db_session.rollback()
+            return jsonify({"error": "Quantity out of range"}), 400
+
+    rejected = sum(1 for result in results if "error" in result)
+    return jsonify(
+        {
+            "results": results,
+            "applied": len(results) - rejected,
+            "rejected": rejected,
+        }
+    )
@@ -0,0 +1,714 @@
+import csv
+import io
+from collections import defaultdict
+from datetime import date, datetime
+
+from sqlalchemy import (
+    Integer,
+    String,
+    column,
+    literal,
+    select,
+    text,
+    true,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.events import publish_event
+from app.core.fields import parse_fields, parse_include, pick
+from app.core.response_cache import invalidate_cache
+from app.core.upsert import upsert_rows
+from app.core.utils import uuidhex
+from app.models.consumable import (
+    Consumable,
+    ConsumableCategory,
+    ConsumableDailyStats,
+    ConsumableHistory,
+    StockAlert,
+)
+
+
+def record_movement(
+    db_session,
+    category_id: str,
+    consumable_id: str,
+    modified_count: int,
+    description: str | None,
+):
+    """Apply a stock movement and log it in a single statement.
+
+    The quantity is changed server-side by ``UPDATE ... RETURNING`` and the
+    history and daily stats rows are written from its result, so concurrent
+    movements never lose updates and the row lock is only held for the
+    statement itself. Returns ``None`` if the consumable does not exist.
+    """
+    modified_time = datetime.now()
+    consumable = (
+        update(Consumable.__table__)
+        .where(Consumable.category_id == category_id)
+        .where(Consumable.consumable_id == consumable_id)
+        .values(
+            quantity=Consumable.quantity + modified_count,
+            version=Consumable.version + 1,
+        )
+        .returning(
+            Consumable.consumable_id, Consumable.quantity, Consumable.min_quantity
+        )
+        .cte("consumable")
+    )
+    history = (
+        insert(ConsumableHistory.__table__)
+        .from_select(
+            ["modified_count", "modified_time", "description", "consumable_id"],
+            select(
+                literal(modified_count),
+                literal(modified_time),
+                literal(description, String),
+                consumable.c.consumable_id,
+            ),
+        )
+        .returning(*ConsumableHistory.__table__.c)
+        .cte("history")
+    )
+    daily_stats = upsert_daily_stats(
+        insert(ConsumableDailyStats.__table__).from_select(
+            DAILY_STATS_COLUMNS,
+            select(
+                consumable.c.consumable_id,
+                literal(modified_time.date()),
+                literal(max(modified_count, 0)),
+                literal(max(-modified_count, 0)),
+                literal(1),
+                consumable.c.quantity,
+            ),
+        )
+    ).cte("daily_stats")
+
+    row = db_session.execute(
+        select(history, consumable.c.quantity, consumable.c.min_quantity)
+        .join(consumable, history.c.consumable_id == consumable.c.consumable_id)
+        .add_cte(daily_stats)
+    ).one_or_none()
+    if row is None:
+        return None
+
+    values = row._asdict()
+    quantity = values.pop("quantity")
+    min_quantity = values.pop("min_quantity")
+    if is_below(quantity - modified_count, min_quantity) != is_below(
+        quantity, min_quantity
+    ):
+        update_stock_alerts(
+            db_session,
+            [
+                {
+                    "consumable_id": consumable_id,
+                    "category_id": category_id,
+                    "quantity": quantity,
+                    "min_quantity": min_quantity,
+                }
+            ],
+        )
+    return ConsumableHistory(**values), quantity
+
+
+def record_movements(db_session, movements: list):
+    """Apply a batch of stock movements with set-based statements.
+
+    Movements are summed per consumable and applied by one ``UPDATE ...
+    FROM (VALUES ...)``; a consumable whose net movement would make its
+    quantity negative is left untouched and all of its movements are
+    rejected. History rows for the applied movements are written with one
+    multi-row INSERT. Invalidates the cached responses of the changed
+    consumables, publishes their new quantities and updates the stock alerts
+    of those crossing their threshold. Returns one result dict per movement,
+    in input order.
+    """
+    deltas = defaultdict(int)
+    for movement in movements:
+        deltas[movement.consumable_id] += movement.modified_count
+
+    consumables = Consumable.__table__
+    batch = values(
+        column("consumable_id", String), column("delta", Integer), name="batch"
+    ).data(sorted(deltas.items()))
+    # Lock the rows in a fixed order so that overlapping batches cannot
+    # deadlock each other.
+    locked = (
+        select(consumables.c.consumable_id)
+        .where(consumables.c.consumable_id.in_(deltas))
+        .order_by(consumables.c.consumable_id)
+        .with_for_update()
+        .cte("locked")
+    )
+    applied = {
+        row.consumable_id: row
+        for row in db_session.execute(
+            update(consumables)
+            .where(consumables.c.consumable_id == batch.c.consumable_id)
+            .where(consumables.c.consumable_id == locked.c.consumable_id)
+            .where(consumables.c.quantity + batch.c.delta >= 0)
+            .values(
+                quantity=consumables.c.quantity + batch.c.delta,
+                version=consumables.c.version + 1,
+            )
+            .returning(
+                consumables.c.consumable_id,
+                consumables.c.quantity,
+                consumables.c.min_quantity,
+                consumables.c.category_id,
+            )
+        )
+    }
+    invalidate_cache(
+        db_session,
+        *[f"consumable:{row.consumable_id}" for row in applied.values()],
+        *[f"consumables:{row.category_id}" for row in applied.values()],
+    )
+    for row in applied.values():
+        publish_event(
+            db_session,
+            {
+                "type": "consumable.movement",
+                "consumable_id": row.consumable_id,
+                "category_id": row.category_id,
+                "quantity": row.quantity,
+            },
+        )
+    update_stock_alerts(
+        db_session,
+        [
+            row._asdict()
+            for row in applied.values()
+            if is_below(row.quantity - deltas[row.consumable_id], row.min_quantity)
+            != is_below(row.quantity, row.min_quantity)
+        ],
+    )
+
+    existing = set(applied)
+    if rejected := deltas.keys() - applied.keys():
+        existing.update(
+            db_session.scalars(
+                select(Consumable.consumable_id).where(
+                    Consumable.consumable_id.in_(rejected)
+                )
+            )
+        )
+
+    modified_time = datetime.now()
+    rows = [
+        {
+            "modified_count": movement.modified_count,
+            "modified_time": modified_time,
+            "description": movement.description,
+            "consumable_id": movement.consumable_id,
+        }
+        for movement in movements
+        if movement.consumable_id in applied
+    ]
+    daily_stats = {}
+    for movement in movements:
+        if movement.consumable_id in applied:
+            stats = daily_stats.setdefault(
+                movement.consumable_id,
+                {
+                    "consumable_id": movement.consumable_id,
+                    "day": modified_time.date(),
+                    "inflow": 0,
+                    "outflow": 0,
+                    "movement_count": 0,
+                    "closing_quantity": applied[movement.consumable_id].quantity,
+                },
+            )
+            stats["inflow"] += max(movement.modified_count, 0)
+            stats["outflow"] += max(-movement.modified_count, 0)
+            stats["movement_count"] += 1
+    record_daily_stats(db_session, list(daily_stats.values()))
+
+    history_ids = iter(
+        db_session.scalars(
+            insert(ConsumableHistory.__table__).returning(
+                ConsumableHistory.history_id, sort_by_parameter_order=True
+            ),
+            rows,
+        ).all()
+        if rows
+        else []
+    )
+
+    results = []
+    for movement in movements:
+        if movement.consumable_id in applied:
+            results.append(
+                {
+                    "consumable_id": movement.consumable_id,
+                    "history_id": next(history_ids),
+                    "quantity": applied[movement.consumable_id].quantity,
+                }
+            )
+        elif movement.consumable_id in existing:
+            results.append(
+                {
+                    "consumable_id": movement.consumable_id,
+                    "error": "Not enough quantity",
+                }
+            )
+        else:
+            results.append(
+                {
+                    "consumable_id": movement.consumable_id,
+                    "error": "Consumable not found",
+                }
+            )
+    return results
+
+
+def upsert_consumables(
+    db_session, category_id: str, consumables: list, update_existing: bool
+):
+    """Bulk-create consumables in a category.
+
+    A name that already exists in another category is always a conflict.
+    A quantity changed by an update is logged as a movement of the
+    difference, like any other change of stock.
+    """
+    rows = [
+        {
+            "consumable_id": uuidhex(),
+            "name": consumable.name,
+            "quantity": consumable.quantity,
+            "min_quantity": consumable.min_quantity,
+            "description": consumable.description,
+            "created_at": date.today(),
+            "category_id": category_id,
+        }
+        for consumable in consumables
+    ]
+    table = Consumable.__table__
+    previous = {}
+    if update_existing:
+        # Locked until the commit, so that the logged differences are the
+        # ones the update applies.
+        previous = dict(
+            db_session.execute(
+                select(Consumable.name, Consumable.quantity)
+                .where(Consumable.category_id == category_id)
+                .where(Consumable.name.in_([row["name"] for row in rows]))
+                .order_by(Consumable.name)
+                .with_for_update()
+            ).all()
+        )
+    results = upsert_rows(
+        db_session,
+        table,
+        rows,
+        ["quantity", "min_quantity", "description"] if update_existing else [],
+        where=lambda excluded: table.c.category_id == excluded.category_id,
+    )
+
+    written = {row["name"]: row for row in reversed(rows)}
+    for result in results:
+        if result["status"] == "updated":
+            publish_event(
+                db_session,
+                {
+                    "type": "consumable.updated",
+                    "consumable_id": result["consumable_id"],
+                    "category_id": category_id,
+                    "quantity": written[result["name"]]["quantity"],
+                },
+            )
+
+    history = []
+    daily_stats = []
+    for result in results:
+        if result["status"] == "conflict":
+            continue
+
+        quantity = written[result["name"]]["quantity"]
+        history_row, stats = set_quantity_rows(
+            result["consumable_id"],
+            previous.get(result["name"], quantity),
+            quantity,
+            "Set by batch update",
+        )
+        if history_row is not None:
+            history.append(history_row)
+        daily_stats.append(stats)
+    if history:
+        db_session.execute(insert(ConsumableHistory.__table__), history)
+    record_daily_stats(db_session, daily_stats)
+    update_stock_alerts(
+        db_session,
+        [
+            {
+                **written[result["name"]],
+                "consumable_id": result["consumable_id"],
+            }
+            for result in results
+            if result["status"] != "conflict"
+        ],
+    )
+    return results
+
+
+def is_below(quantity: int, min_quantity: int | None) -> bool:
+    return min_quantity is not None and quantity < min_quantity
+
+
+def update_stock_alerts(db_session, consumables: list):
+    """Bring the stock alerts of ``consumables`` in line with their quantity.
+
+    Each item is a mapping with the consumable_id, category_id, quantity and
+    min_quantity of a consumable. An alert is opened for those below their
+    threshold unless one is already open, and the open alert of the others
+    is closed. Movements only call this when they cross the threshold.
+    """
+    alerts = StockAlert.__table__
+    now = datetime.now()
+    below = {
+        consumable["consumable_id"]: consumable
+        for consumable in consumables
+        if is_below(consumable["quantity"], consumable["min_quantity"])
+    }
+    restocked = {
+        consumable["consumable_id"]: consumable
+        for consumable in consumables
+        if consumable["consumable_id"] not in below
+    }
+
+    opened = []
+    if below:
+        opened = db_session.scalars(
+            insert(alerts)
+            .on_conflict_do_nothing(
+                index_elements=[alerts.c.consumable_id],
+                index_where=alerts.c.closed_at.is_(None),
+            )
+            .returning(alerts.c.consumable_id),
+            [
+                {
+                    "consumable_id": consumable["consumable_id"],
+                    "quantity": consumable["quantity"],
+                    "min_quantity": consumable["min_quantity"],
+                    "opened_at": now,
+                }
+                for consumable in below.values()
+            ],
+        ).all()
+
+    closed = []
+    if restocked:
+        closed = db_session.scalars(
+            update(alerts)
+            .where(alerts.c.consumable_id.in_(restocked))
+            .where(alerts.c.closed_at.is_(None))
+            .values(closed_at=now)
+            .returning(alerts.c.consumable_id)
+        ).all()
+
+    for event_type, changed, consumables_by_id in [
+        ("stock_alert.opened", opened, below),
+        ("stock_alert.closed", closed, restocked),
+    ]:
+        for consumable_id in changed:
+            consumable = consumables_by_id[consumable_id]
+            publish_event(
+                db_session,
+                {
+                    "type": event_type,
+                    "consumable_id": consumable_id,
+                    "category_id": consumable["category_id"],
+                    "quantity": consumable["quantity"],
+                    "min_quantity": consumable["min_quantity"],
+                },
+            )
+
+
+def parse_embed(query, allowed: tuple):
+    """Parse the ``include`` and ``fields[...]`` parameters of ``query``.
+
+    Returns the requested relations and the fields to serialize of each
+    resource type. Raises ValueError for unknown ones.
+    """
+    include = parse_include(query.include, allowed)
+    fields = {
+        "categories": parse_fields(
+            query.category_fields, ConsumableCategory.json_columns()
+        ),
+        "consumables": parse_fields(query.consumable_fields, Consumable.json_columns()),
+        "history": parse_fields(query.history_fields, ConsumableHistory.json_columns()),
+    }
+    return include, fields
+
+
+def latest_history(db_session, consumable_ids: list, limit: int) -> dict:
+    """Map each of ``consumable_ids`` to its latest ``limit`` history rows.
+
+    This is one query, whatever the number of consumables: a LATERAL
+    subquery per consumable reads its rows from the (consumable_id,
+    history_id DESC) index.
+    """
+    history = {consumable_id: [] for consumable_id in consumable_ids}
+    if not consumable_ids:
+        return history
+
+    latest = (
+        select(*ConsumableHistory.json_columns())
+        .where(ConsumableHistory.consumable_id == Consumable.consumable_id)
+        .order_by(ConsumableHistory.history_id.desc())
+        .limit(limit)
+        .lateral("latest")
+    )
+    rows = db_session.execute(
+        select(latest)
+        .select_from(Consumable)
+        .join(latest, true())
+        .where(Consumable.consumable_id.in_(consumable_ids))
+        .order_by(latest.c.consumable_id, latest.c.history_id.desc())
+    )
+    for row in rows:
+        history[row.consumable_id].append(row)
+    return history
+
+
+def represent_consumables(
+    db_session, consumables: list, fields: dict, history_limit: int | None
+):
+    """Serialize ``consumables`` with only the requested fields.
+
+    With a ``history_limit``, each one embeds its latest history rows.
+    Returns the representations and a fingerprint of everything they were
+    built from, to derive the ETag from.
+    """
+    history = {}
+    if history_limit is not None:
+        history = latest_history(
+            db_session,
+            [consumable.consumable_id for consumable in consumables],
+            history_limit,
+        )
+
+    representations = []
+    fingerprint = []
+    for consumable in consumables:
+        representation = pick(consumable, fields["consumables"])
+        rows = history.get(consumable.consumable_id, [])
+        if history_limit is not None:
+            representation["history"] = [pick(row, fields["history"]) for row in rows]
+        representations.append(representation)
+        fingerprint.append(
+            (
+                consumable.consumable_id,
+                consumable.version,
+                [row.history_id for row in rows],
+            )
+        )
+    return representations, fingerprint
+
+
+DAILY_STATS_COLUMNS = [
+    "consumable_id",
+    "day",
+    "inflow",
+    "outflow",
+    "movement_count",
+    "closing_quantity",
+]
+
+
+def upsert_daily_stats(statement):
+    """Make an INSERT into consumable_daily_stats add to an existing day."""
+    stats = ConsumableDailyStats.__table__
+    return statement.on_conflict_do_update(
+        index_elements=[stats.c.consumable_id, stats.c.day],
+        set_={
+            "inflow": stats.c.inflow + statement.excluded.inflow,
+            "outflow": stats.c.outflow + statement.excluded.outflow,
+            "movement_count": (
+                stats.c.movement_count + statement.excluded.movement_count
+            ),
+            "closing_quantity": statement.excluded.closing_quantity,
+        },
+    )
+
+
+def record_daily_stats(db_session, rows: list):
+    if rows:
+        db_session.execute(
+            upsert_daily_stats(insert(ConsumableDailyStats.__table__)), rows
+        )
+
+
+def opening_daily_stats(consumable_id: str, quantity: int):
+    """Daily stats row recording a quantity set directly, not by a movement."""
+    return {
+        "consumable_id": consumable_id,
+        "day": date.today(),
+        "inflow": 0,
+        "outflow": 0,
+        "movement_count": 0,
+        "closing_quantity": quantity,
+    }
+
+
+def set_quantity_rows(
+    consumable_id: str, previous: int, quantity: int, description: str
+):
+    """History and daily stats rows for a quantity set from ``previous``.
+
+    The difference is logged as a movement, so that the history and the
+    rollup add up to the stock however it was changed. The history row is
+    ``None`` when the quantity stays the same.
+    """
+    stats = opening_daily_stats(consumable_id, quantity)
+    delta = quantity - previous
+    if not delta:
+        return None, stats
+
+    stats["inflow"] = max(delta, 0)
+    stats["outflow"] = max(-delta, 0)
+    stats["movement_count"] = 1
+    history_row = {
+        "modified_count": delta,
+        "modified_time": datetime.now(),
+        "description": description,
+        "consumable_id": consumable_id,
+    }
+    return history_row, stats
+
+
+def remove_daily_stats(db_session, history: ConsumableHistory):
+    db_session.execute(
+        update(ConsumableDailyStats)
+        .where(ConsumableDailyStats.consumable_id == history.consumable_id)
+        .where(ConsumableDailyStats.day == history.modified_time.date())
+        .values(
+            inflow=ConsumableDailyStats.inflow - max(history.modified_count, 0),
+            outflow=ConsumableDailyStats.outflow - max(-history.modified_count, 0),
+            movement_count=ConsumableDailyStats.movement_count - 1,
+        )
+    )
+
+
+def stream_ndjson(result, dumps):
+    for rows in result.partitions():
+        yield "".join(f"{dumps(row)}\n" for row in rows)
+
+
+def stream_csv(result):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(result.keys())
+    # Sent on its own, so that an export without rows still has its header.
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    for rows in result.partitions():
+        writer.writerows(
+            [value.isoformat() if isinstance(value, date) else value for value in row]
+            for row in rows
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+HISTORY_PARTITION_PREFIX = "consumable_history_y"
+
+
+def add_months(month: date, months: int) -> date:
+    month_index = month.year * 12 + month.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def history_partition_name(month: date) -> str:
+    return f"{HISTORY_PARTITION_PREFIX}{month:%Ym%m}"
+
+
+def history_partition_months(names) -> dict:
+    return {
+        datetime.strptime(name, f"{HISTORY_PARTITION_PREFIX}%Ym%m").date(): name
+        for name in names
+        if name.startswith(HISTORY_PARTITION_PREFIX)
+    }
+
+
+def history_partitions(db_session) -> dict:
+    """Map the first day of each month to its attached history partition."""
+    return history_partition_months(
+        db_session.scalars(
+            text(
+                "SELECT CAST(inhrelid::regclass AS TEXT) FROM pg_inherits "
+                "WHERE inhparent = 'consumable_history'::regclass"
+            )
+        )
+    )
+
+
+def detached_history_partitions(db_session) -> dict:
+    """Map the first day of each month to its detached history partition.
+
+    These are left behind by an archive that failed after the detach.
+    """
+    return history_partition_months(
+        db_session.scalars(
+            text(
+                "SELECT relname FROM pg_class "
+                "WHERE relkind = 'r' AND NOT relispartition"
+            )
+        )
+    )
+
+
+def create_history_partitions(db_session, months_ahead: int) -> list:
+    """Create the missing monthly partitions up to ``months_ahead`` months.
+
+    Rows falling outside every monthly partition end up in the default one,
+    so this has to run before a month starts.
+    """
+    # Serializes concurrent runs, without blocking reads and writes, so that
+    # none tries to create a partition another one just created.
+    db_session.execute(
+        text("LOCK TABLE consumable_history IN SHARE UPDATE EXCLUSIVE MODE")
+    )
+    existing = history_partitions(db_session)
+    month = date.today().replace(day=1)
+    created = []
+    for _ in range(months_ahead + 1):
+        if month not in existing:
+            name = history_partition_name(month)
+            db_session.execute(
+                text(
+                    f"CREATE TABLE {name} PARTITION OF consumable_history "
+                    f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+                )
+            )
+            created.append(name)
+        month = add_months(month, 1)
+    return created
+
+
+def detach_history_partition(db_session, name: str):
+    """Detach a history partition from consumable_history.
+
+    This locks consumable_history exclusively until the transaction ends,
+    so commit it right away. CONCURRENTLY is not available because of the
+    default partition. Without it, the detach itself does not scan any rows.
+    """
+    db_session.execute(text(f"ALTER TABLE consumable_history DETACH PARTITION {name}"))
+
+
+def dump_history_partition(db_session, name: str, file):
+    """Dump a detached history partition to ``file`` as CSV."""
+    cursor = db_session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER)", file)
+    finally:
+        cursor.close()
+
+
+def drop_history_partition(db_session, name: str):
+    db_session.execute(text(f"DROP TABLE {name}"))
@@ -1,20 +1,46 @@
-from flask import jsonify
+import operator
+
+from flask import jsonify, request
 from flask_pydantic import validate
 from sqlalchemy import select
-
-from app.core.database import session_maker
+from sqlalchemy.exc import IntegrityError
+
+from app.api.consumable.helpers import parse_embed, represent_consumables
+from app.api.consumable_category.helpers import upsert_categories
+from app.core.database import request_session
+from app.core.etag import make_etag, not_modified, with_etag
+from app.core.events import publish_event
+from app.core.fields import pick
+from app.core.filters import apply_filters, sort_keys, starts_with
+from app.core.pagination import paginate
+from app.core.response_cache import cached, invalidate_cache
+from app.core.upsert import summarize_upsert
 from app.main import app
 from app.models.consumable import (
+    Consumable,
     ConsumableCategory,
-    GETListParams,
+    GETCategoryListParams,
+    GETEmbedParams,
+    POSTBatchParams,
     POSTConsumableCategory,
 )
 
+CATEGORY_FILTERS = {
+    "name_prefix": (ConsumableCategory.name, starts_with),
+    "created_since": (ConsumableCategory.created_at, operator.ge),
+    "created_until": (ConsumableCategory.created_at, operator.le),
+}
+CATEGORY_SORTS = {
+    "category_id": ConsumableCategory.category_id,
+    "name": ConsumableCategory.name,
+    "created_at": ConsumableCategory.created_at,
+}
+
 
 @app.post("/categories")
 @validate()
 def api_add_consumable_category(body: POSTConsumableCategory):
-    with session_maker() as db_session:
+    with request_session() as db_session:
         category = db_session.scalar(
             select(ConsumableCategory).where(ConsumableCategory.name == body.name)
         )
@@ -23,42 +49,112 @@ def api_add_consumable_category(body: POSTConsumableCategory):
 
         category = ConsumableCategory(name=body.name, description=body.description)
         db_session.add(category)
-        db_session.commit()
+        invalidate_cache(db_session, "categories")
+        try:
+            db_session.commit()
+        except IntegrityError:
+            db_session.rollback()
+            return jsonify({"error": "Consumable category already exists"}), 400
 
         return jsonify({"category": category.to_dict()}), 201
 
 
-@app.get("/categories")
-@validate()
-def api_get_consumable_categories(query: GETListParams):
-    with session_maker() as db_session:
-        sql_query = select(ConsumableCategory).offset(query.offset)
-        if query.limit:
-            sql_query = sql_query.limit(query.limit)
+@app.post("/categories/batch")
+@validate(body=POSTConsumableCategory, request_body_many=True)
+def api_add_consumable_categories_batch(query: POSTBatchParams):
+    with request_session() as db_session:
+        results = upsert_categories(
+            db_session, request.body_params, query.on_conflict == "update"
+        )
+        invalidate_cache(
+            db_session,
+            "categories",
+            *[
+                f"category:{result['category_id']}"
+                for result in results
+                if result["status"] == "updated"
+            ],
+        )
+        db_session.commit()
 
-        categories = db_session.scalars(sql_query)
+    return jsonify(summarize_upsert(results))
 
-        return jsonify({"categories": [category.to_dict() for category in categories]})
+
+@app.get("/categories")
+@cached("categories")
+@validate()
+def api_get_consumable_categories(query: GETCategoryListParams):
+    with request_session() as db_session:
+        try:
+            categories, next_cursor = paginate(
+                db_session,
+                apply_filters(
+                    select(*ConsumableCategory.json_columns()),
+                    query,
+                    CATEGORY_FILTERS,
+                ),
+                sort_keys(query.sort, CATEGORY_SORTS, ConsumableCategory.category_id),
+                query,
+            )
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+
+    etag = make_etag(
+        [(category.category_id, category.version) for category in categories],
+        next_cursor,
+    )
+    return not_modified(etag) or with_etag(
+        jsonify(
+            {
+                "categories": categories,
+                "next_cursor": next_cursor,
+            }
+        ),
+        etag,
+    )
 
 
 @app.get("/categories/<category_id>")
-def api_get_consumable_category(category_id: str):
-    with session_maker() as db_session:
-        category = db_session.scalar(
-            select(ConsumableCategory).where(
+@cached("category:{category_id}", "consumables:{category_id}")
+@validate()
+def api_get_consumable_category(category_id: str, query: GETEmbedParams):
+    try:
+        include, fields = parse_embed(query, ("consumables", "consumables.history"))
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
+    with request_session() as db_session:
+        category = db_session.execute(
+            select(*ConsumableCategory.json_columns()).where(
                 ConsumableCategory.category_id == category_id
             )
-        )
+        ).one_or_none()
         if category is None:
             return jsonify({"error": "Consumable category not found"}), 404
 
-        return jsonify({"category": category.to_dict()})
+        representation = pick(category, fields["categories"])
+        fingerprint = []
+        if "consumables" in include:
+            consumables = db_session.execute(
+                select(*Consumable.json_columns())
+                .where(Consumable.category_id == category_id)
+                .order_by(Consumable.consumable_id)
+            ).all()
+            representation["consumables"], fingerprint = represent_consumables(
+                db_session,
+                consumables,
+                fields,
+                query.history_limit if "consumables.history" in include else None,
+            )
+
+    etag = make_etag(category.category_id, category.version, fingerprint)
+    return not_modified(etag) or with_etag(jsonify({"category": representation}), etag)
 
 
 @app.put("/categories/<category_id>")
 @validate()
 def api_update_consumable_category(category_id: str, body: POSTConsumableCategory):
-    with session_maker() as db_session:
+    with request_session() as db_session:
         category = db_session.scalar(
             select(ConsumableCategory).where(
                 ConsumableCategory.category_id == category_id
@@ -69,6 +165,8 @@ def api_update_consumable_category(category_id: str, body: POSTConsumableCategor
 
         category.name = body.name
         category.description = body.description
+        category.version = ConsumableCategory.version + 1
+        invalidate_cache(db_session, "categories", f"category:{category_id}")
 
         db_session.commit()
 
@@ -77,7 +175,7 @@ def api_update_consumable_category(category_id: str, body: POSTConsumableCategor
 
 @app.delete("/categories/<category_id>")
 def api_delete_consumable_category(category_id: str):
-    with session_maker() as db_session:
+    with request_session() as db_session:
         category = db_session.scalar(
             select(ConsumableCategory).where(
                 ConsumableCategory.category_id == category_id
@@ -87,6 +185,15 @@ def api_delete_consumable_category(category_id: str):
             return jsonify({"error": "Consumable category not found"}), 404
 
         db_session.delete(category)
+        invalidate_cache(
+            db_session,
+            "categories",
+            f"category:{category_id}",
+            f"consumables:{category_id}",
+        )
+        publish_event(
+            db_session, {"type": "category.deleted", "category_id": category_id}
+        )
         db_session.commit()
 
         return jsonify({"message": "Consumable category deleted"})
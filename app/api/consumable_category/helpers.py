@@ -0,0 +1,23 @@
+from datetime import date
+
+from app.core.upsert import upsert_rows
+from app.core.utils import uuidhex
+from app.models.consumable import ConsumableCategory
+
+
+def upsert_categories(db_session, categories: list, update_existing: bool):
+    rows = [
+        {
+            "category_id": uuidhex(),
+            "name": category.name,
+            "description": category.description,
+            "created_at": date.today(),
+        }
+        for category in categories
+    ]
+    return upsert_rows(
+        db_session,
+        ConsumableCategory.__table__,
+        rows,
+        ["description"] if update_existing else [],
+    )
@@ -0,0 +1,50 @@
+from flask import Response, jsonify, make_response, stream_with_context
+from flask_pydantic import validate
+
+from app.core.config import Config
+from app.core.database import close_request_session
+from app.core.events import TooManySubscribers, bus, dump_event
+from app.core.profiling import streaming
+from app.main import app
+from app.models.consumable import GETEventsParams
+
+
+@app.get("/events")
+@streaming
+@validate()
+def api_get_events(query: GETEventsParams):
+    try:
+        subscription = bus.subscribe(
+            category_id=query.category_id, consumable_id=query.consumable_id
+        )
+    except TooManySubscribers:
+        response = make_response(
+            jsonify({"error": "Too many event subscribers, try again"}), 503
+        )
+        response.headers["Retry-After"] = str(Config.EVENTS_RECONNECT_DELAY)
+        return response
+
+    def stream():
+        try:
+            yield f"retry: {Config.EVENTS_RECONNECT_DELAY * 1000}\n\n"
+            while not subscription.overflowed:
+                stock_event = subscription.get(Config.EVENTS_KEEPALIVE)
+                if stock_event is None:
+                    # Comments keep proxies from closing an idle stream.
+                    yield ": keepalive\n\n"
+                else:
+                    yield (
+                        f"event: {stock_event['type']}\n"
+                        f"data: {dump_event(stock_event)}\n\n"
+                    )
+        finally:
+            bus.unsubscribe(subscription)
+
+    # The request context lives as long as the stream, but the connection
+    # the auth hook checked out is given back before the first event.
+    close_request_session()
+    return Response(
+        stream_with_context(stream()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
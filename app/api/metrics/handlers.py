@@ -0,0 +1,9 @@
+from flask import Response
+
+from app.core.metrics import registry
+from app.main import app
+
+
+@app.get("/metrics")
+def api_get_metrics():
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,30 @@
+from flask import jsonify
+from flask_pydantic import validate
+
+from app.api.search.helpers import search_categories_query, search_consumables_query
+from app.core.database import request_session
+from app.core.pagination import paginate
+from app.main import app
+from app.models.consumable import GETSearchParams
+
+
+@app.get("/search")
+@validate()
+def api_search(query: GETSearchParams):
+    if query.scope == "categories":
+        sql_query, keys = search_categories_query(query.q)
+    else:
+        sql_query, keys = search_consumables_query(query.q)
+
+    with request_session() as db_session:
+        try:
+            results, next_cursor = paginate(db_session, sql_query, keys, query)
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+
+        return jsonify(
+            {
+                query.scope: results,
+                "next_cursor": next_cursor,
+            }
+        )
@@ -0,0 +1,90 @@
+import re
+
+from sqlalchemy import Double, cast, false, func, literal, or_, select, union
+from sqlalchemy.dialects.postgresql import REGCONFIG
+
+from app.models.consumable import Consumable, ConsumableCategory, search_document
+
+
+def prefix_tsquery(q: str):
+    """Query matching documents with words starting with every word of ``q``."""
+    words = re.findall(r"\w+", q.lower())
+    if not words:
+        return None
+
+    return func.to_tsquery(
+        cast(literal("simple"), REGCONFIG), " & ".join(f"{word}:*" for word in words)
+    )
+
+
+def matches(document, name, q: str, tsquery):
+    """Prefix match on the document or trigram match on the name.
+
+    Each side is answered by its own GIN index and the two are combined with
+    a BitmapOr.
+    """
+    return or_(
+        document.op("@@")(tsquery) if tsquery is not None else false(),
+        name.op("%")(q),
+    )
+
+
+def relevance(document, name, q: str, tsquery):
+    rank = func.ts_rank(document, tsquery) if tsquery is not None else 0
+    # As double precision, the score survives the round trip through the
+    # cursor exactly, which real does not.
+    return cast(rank + func.similarity(name, q), Double)
+
+
+def search_categories_query(q: str):
+    tsquery = prefix_tsquery(q)
+    document = search_document((ConsumableCategory.name, "A"))
+    results = (
+        select(
+            *ConsumableCategory.json_columns(),
+            relevance(document, ConsumableCategory.name, q, tsquery).label("score"),
+        )
+        .where(matches(document, ConsumableCategory.name, q, tsquery))
+        .subquery("results")
+    )
+    return select(results), [(results.c.score, True), (results.c.category_id, False)]
+
+
+def search_consumables_query(q: str):
+    """Consumables matching by name, description or category name.
+
+    The consumables of matching categories are found through the category
+    indexes and joined by category_id, rather than with an OR across the
+    join that no index could answer.
+    """
+    tsquery = prefix_tsquery(q)
+    consumable_document = search_document(
+        (Consumable.name, "A"), (Consumable.description, "B")
+    )
+    category_document = search_document((ConsumableCategory.name, "A"))
+    matching = union(
+        select(Consumable.consumable_id).where(
+            matches(consumable_document, Consumable.name, q, tsquery)
+        ),
+        select(Consumable.consumable_id)
+        .join(
+            ConsumableCategory,
+            Consumable.category_id == ConsumableCategory.category_id,
+        )
+        .where(matches(category_document, ConsumableCategory.name, q, tsquery)),
+    ).subquery("matching")
+
+    # Matches on the category count for less than matches on the item.
+    score = relevance(
+        consumable_document, Consumable.name, q, tsquery
+    ) + 0.5 * relevance(category_document, ConsumableCategory.name, q, tsquery)
+    results = (
+        select(*Consumable.json_columns(), score.label("score"))
+        .join(matching, matching.c.consumable_id == Consumable.consumable_id)
+        .join(
+            ConsumableCategory,
+            Consumable.category_id == ConsumableCategory.category_id,
+        )
+        .subquery("results")
+    )
+    return select(results), [(results.c.score, True), (results.c.consumable_id, False)]
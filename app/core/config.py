@@ -16,6 +16,69 @@ class Config:
 
     DATABASE_URL = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
 
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "-1"))
+    DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "false").lower() == "true"
+    # Milliseconds, 0 disables the timeout.
+    DB_STATEMENT_TIMEOUT = int(os.environ.get("DB_STATEMENT_TIMEOUT", "0"))
+
     USER_SESSION_EXPIRY = int(os.environ.get("USER_SESSION_EXPIRY"))
     USER_SESSION_REFRESH = int(os.environ.get("USER_SESSION_REFRESH"))
     SALT_SIZE = int(os.environ.get("SALT_SIZE"))
+
+    PASSWORD_HASH_DIGEST = os.environ.get("PASSWORD_HASH_DIGEST", "sha256")
+    PASSWORD_HASH_ITERATIONS = int(os.environ.get("PASSWORD_HASH_ITERATIONS", "100000"))
+    # Processes per gunicorn worker, 0 hashes inline on the request thread.
+    PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", "1"))
+    PASSWORD_HASH_CONCURRENCY = int(os.environ.get("PASSWORD_HASH_CONCURRENCY", "4"))
+    PASSWORD_HASH_QUEUE_TIMEOUT = float(
+        os.environ.get("PASSWORD_HASH_QUEUE_TIMEOUT", "5")
+    )
+
+    # Also accept stateless bearer tokens signed with SECRET_KEY, checked
+    # without a database round trip.
+    SIGNED_TOKENS = os.environ.get("SIGNED_TOKENS", "false").lower() == "true"
+    SIGNED_TOKEN_EXPIRY = int(os.environ.get("SIGNED_TOKEN_EXPIRY", "900"))
+    REVOKED_TOKENS_REFRESH = int(os.environ.get("REVOKED_TOKENS_REFRESH", "5"))
+
+    USER_SESSION_CACHE_SIZE = int(os.environ.get("USER_SESSION_CACHE_SIZE", "10000"))
+    # Also how long a worker may still accept a session logged out through
+    # another worker, or see a role changed by one or outside the ORM.
+    USER_SESSION_CACHE_TTL = int(os.environ.get("USER_SESSION_CACHE_TTL", "5"))
+    USER_SESSION_COUNT_TTL = int(os.environ.get("USER_SESSION_COUNT_TTL", "30"))
+
+    HISTORY_PARTITION_MONTHS_AHEAD = int(
+        os.environ.get("HISTORY_PARTITION_MONTHS_AHEAD", "3")
+    )
+
+    MOVEMENT_BATCH_MAX_SIZE = int(os.environ.get("MOVEMENT_BATCH_MAX_SIZE", "50000"))
+    HISTORY_EXPORT_BATCH_SIZE = int(os.environ.get("HISTORY_EXPORT_BATCH_SIZE", "1000"))
+
+    REDIS_URL = os.environ.get("REDIS_URL")
+    # "redis" shares the cache between workers and is the default when
+    # REDIS_URL is set, "memory" keeps it in each worker and is only safe with
+    # a single process, "none" disables it.
+    RESPONSE_CACHE_BACKEND = os.environ.get(
+        "RESPONSE_CACHE_BACKEND", "redis" if REDIS_URL else "none"
+    )
+    RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "10000"))
+    RESPONSE_CACHE_TTL = int(os.environ.get("RESPONSE_CACHE_TTL", "300"))
+
+    # Record per endpoint timings in the metrics, and profile a sample of the
+    # requests, keeping the profiles of the slow ones.
+    PROFILING = os.environ.get("PROFILING", "false").lower() == "true"
+    PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_SLOW_THRESHOLD = float(os.environ.get("PROFILE_SLOW_THRESHOLD", "1"))
+    PROFILE_DIRECTORY = os.environ.get("PROFILE_DIRECTORY", "profiles")
+
+    # "postgres" fans events out through LISTEN/NOTIFY to every worker,
+    # "memory" only to the subscribers of the worker that published them.
+    EVENTS_BACKEND = os.environ.get("EVENTS_BACKEND", "postgres")
+    EVENTS_CHANNEL = os.environ.get("EVENTS_CHANNEL", "stock_events")
+    # Per worker, each subscriber holds one of its threads.
+    EVENTS_MAX_SUBSCRIBERS = int(os.environ.get("EVENTS_MAX_SUBSCRIBERS", "100"))
+    EVENTS_QUEUE_SIZE = int(os.environ.get("EVENTS_QUEUE_SIZE", "1000"))
+    EVENTS_KEEPALIVE = int(os.environ.get("EVENTS_KEEPALIVE", "15"))
+    EVENTS_RECONNECT_DELAY = int(os.environ.get("EVENTS_RECONNECT_DELAY", "1"))
@@ -1,9 +1,50 @@
+from contextlib import contextmanager
+
+from flask import g
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import Config
+from app.core.profiling import TimedQueuePool
+
+connect_args = {}
+if Config.DB_STATEMENT_TIMEOUT:
+    connect_args["options"] = f"-c statement_timeout={Config.DB_STATEMENT_TIMEOUT}"
 
-engine = create_engine(Config.DATABASE_URL)
+engine = create_engine(
+    Config.DATABASE_URL,
+    pool_size=Config.DB_POOL_SIZE,
+    max_overflow=Config.DB_MAX_OVERFLOW,
+    pool_timeout=Config.DB_POOL_TIMEOUT,
+    pool_recycle=Config.DB_POOL_RECYCLE,
+    pool_pre_ping=Config.DB_POOL_PRE_PING,
+    connect_args=connect_args,
+    poolclass=TimedQueuePool if Config.PROFILING else None,
+)
 session_maker = sessionmaker(
     autocommit=False, autoflush=False, expire_on_commit=False, bind=engine
 )
+
+
+@contextmanager
+def request_session():
+    """Yield the session shared by everything that handles the current request.
+
+    The session is created on first use and closed by close_request_session
+    when the request is torn down, so the auth hook and the view check out
+    at most one connection between them.
+    """
+    if "db_session" not in g:
+        g.db_session = session_maker()
+
+    try:
+        yield g.db_session
+    except Exception:
+        g.db_session.rollback()
+        raise
+
+
+def close_request_session(exception=None):
+    db_session = g.pop("db_session", None)
+    if db_session is not None:
+        db_session.close()
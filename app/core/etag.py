@@ -0,0 +1,23 @@
+import hashlib
+import json
+
+from flask import Response, request
+
+
+def make_etag(*values) -> str:
+    """Strong entity tag of a representation identified by ``values``."""
+    return hashlib.sha1(json.dumps(values, default=str).encode()).hexdigest()
+
+
+def not_modified(etag: str):
+    """Return a 304 response if the client already has ``etag``, else None."""
+    if etag in request.if_none_match:
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    return None
+
+
+def with_etag(response, etag: str):
+    response.set_etag(etag)
+    return response
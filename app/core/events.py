@@ -0,0 +1,193 @@
+import json
+import logging
+import queue
+import select
+import threading
+import time
+
+import psycopg2
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.core.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Subscription:
+    def __init__(self, maxsize: int, category_id=None, consumable_id=None):
+        self.category_id = category_id
+        self.consumable_id = consumable_id
+        self.overflowed = False
+        self._queue = queue.Queue(maxsize)
+
+    def matches(self, stock_event: dict) -> bool:
+        # Events without the filtered field, like resets, go to everyone.
+        return (
+            not self.category_id
+            or stock_event.get("category_id", self.category_id) == self.category_id
+        ) and (
+            not self.consumable_id
+            or stock_event.get("consumable_id", self.consumable_id)
+            == self.consumable_id
+        )
+
+    def put(self, stock_event: dict):
+        try:
+            self._queue.put_nowait(stock_event)
+        except queue.Full:
+            # A subscriber that does not keep up is disconnected instead of
+            # silently missing events; the client reconnects and reloads.
+            self.overflowed = True
+
+    def get(self, timeout: float):
+        """Return the next event, or ``None`` if none arrived in ``timeout``."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBus:
+    """Fans stock events out to the subscribers of this process."""
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self._listener = None
+
+    def subscribe(self, **filters) -> Subscription:
+        """Subscribe to the events matching ``filters``.
+
+        Raises TooManySubscribers once EVENTS_MAX_SUBSCRIBERS are connected.
+        """
+        subscription = Subscription(Config.EVENTS_QUEUE_SIZE, **filters)
+        with self._lock:
+            if len(self._subscriptions) >= Config.EVENTS_MAX_SUBSCRIBERS:
+                raise TooManySubscribers
+            if Config.EVENTS_BACKEND == "postgres" and self._listener is None:
+                # Started on first use, so that it runs in the gunicorn worker
+                # rather than in the master process it is forked from.
+                self._listener = PostgresListener(self)
+                self._listener.start()
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def dispatch(self, stock_event: dict):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if subscription.matches(stock_event):
+                subscription.put(stock_event)
+
+    def __len__(self):
+        return len(self._subscriptions)
+
+
+class PostgresListener(threading.Thread):
+    """Dispatches the notifications of the events channel to the bus.
+
+    It holds one dedicated connection per process, outside of the pool.
+    """
+
+    def __init__(self, bus: EventBus):
+        super().__init__(name="events-listener", daemon=True)
+        self.bus = bus
+
+    def run(self):
+        connected_before = False
+        while True:
+            try:
+                connection = psycopg2.connect(Config.DATABASE_URL)
+            except Exception:
+                logger.exception("Could not connect the events listener")
+                time.sleep(Config.EVENTS_RECONNECT_DELAY)
+                continue
+
+            try:
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {Config.EVENTS_CHANNEL}")
+                if connected_before:
+                    # Events published while disconnected are lost, so the
+                    # subscribers have to reload.
+                    self.bus.dispatch({"type": "reset"})
+                connected_before = True
+                self.listen(connection)
+            except Exception:
+                # Whatever the error, the thread must survive it, or every
+                # subscriber of the worker silently stops receiving events.
+                logger.exception("Events listener disconnected")
+                time.sleep(Config.EVENTS_RECONNECT_DELAY)
+            finally:
+                connection.close()
+
+    def listen(self, connection):
+        while True:
+            select.select([connection], [], [], Config.EVENTS_KEEPALIVE)
+            connection.poll()
+            while connection.notifies:
+                notify = connection.notifies.pop(0)
+                try:
+                    stock_event = json.loads(notify.payload)
+                except ValueError:
+                    stock_event = None
+                if not isinstance(stock_event, dict):
+                    # Anything can NOTIFY the channel, not only this app.
+                    logger.warning("Dropped malformed event: %r", notify.payload)
+                    continue
+                self.bus.dispatch(stock_event)
+
+
+bus = EventBus()
+
+
+def dump_event(stock_event: dict) -> str:
+    return json.dumps(stock_event, default=str, separators=(",", ":"))
+
+
+def publish_event(db_session, stock_event: dict):
+    """Publish ``stock_event`` once the transaction of ``db_session`` commits."""
+    db_session.info.setdefault("events", []).append(stock_event)
+
+
+@event.listens_for(Session, "before_commit")
+def notify_events(db_session):
+    # NOTIFY is transactional: Postgres delivers it on commit and drops it on
+    # rollback, so it is sent as part of the transaction itself.
+    if Config.EVENTS_BACKEND != "postgres" or not db_session.info.get("events"):
+        return
+
+    db_session.execute(
+        text(
+            "SELECT pg_notify(:channel, payload) "
+            "FROM unnest(CAST(:payloads AS TEXT[])) AS payload"
+        ),
+        {
+            "channel": Config.EVENTS_CHANNEL,
+            "payloads": [
+                dump_event(stock_event) for stock_event in db_session.info["events"]
+            ],
+        },
+    )
+
+
+@event.listens_for(Session, "after_commit")
+def dispatch_events(db_session):
+    stock_events = db_session.info.pop("events", None)
+    if stock_events and Config.EVENTS_BACKEND == "memory":
+        for stock_event in stock_events:
+            bus.dispatch(stock_event)
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_events(db_session):
+    db_session.info.pop("events", None)
@@ -0,0 +1,36 @@
+def parse_fields(value: str | None, columns: list) -> list:
+    """Names of the fields requested by a comma-separated ``value``.
+
+    All of ``columns`` are returned when ``value`` is not given. Raises
+    ValueError for a name that is not one of them.
+    """
+    names = [column.key for column in columns]
+    if value is None:
+        return names
+
+    requested = {name.strip() for name in value.split(",")} - {""}
+    if unknown := requested - set(names):
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return [name for name in names if name in requested]
+
+
+def parse_include(value: str | None, allowed: tuple) -> set:
+    """Relations requested by a comma-separated ``value``.
+
+    A nested relation like ``"consumables.history"`` implies its parents.
+    Raises ValueError for a relation not in ``allowed``.
+    """
+    if value is None:
+        return set()
+
+    requested = {name.strip() for name in value.split(",")} - {""}
+    if unknown := requested - set(allowed):
+        raise ValueError(f"Unknown include: {', '.join(sorted(unknown))}")
+    for name in list(requested):
+        parts = name.split(".")
+        requested.update(".".join(parts[:i]) for i in range(1, len(parts)))
+    return requested
+
+
+def pick(row, names: list) -> dict:
+    return {name: getattr(row, name) for name in names}
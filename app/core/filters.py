@@ -0,0 +1,34 @@
+def starts_with(column, value: str):
+    return column.startswith(value, autoescape=True)
+
+
+def has_direction(column, value: str):
+    """Inflows ("in") are positive amounts, outflows ("out") negative ones."""
+    return column > 0 if value == "in" else column < 0
+
+
+def apply_filters(sql_query, query, filters: dict):
+    """Add a WHERE clause for every filter parameter set in ``query``.
+
+    ``filters`` maps a parameter name to a ``(column, compare)`` pair, and
+    only those parameters are ever turned into SQL.
+    """
+    for name, (column, compare) in filters.items():
+        value = getattr(query, name)
+        if value is not None:
+            sql_query = sql_query.where(compare(column, value))
+    return sql_query
+
+
+def sort_keys(sort: str, columns: dict, primary_key) -> list:
+    """Keyset pagination keys for a ``sort`` like ``"name"`` or ``"-name"``.
+
+    The primary key breaks ties in the same direction, so that the keys
+    compare as one row value and can be answered by a composite index.
+    """
+    descending = sort.startswith("-")
+    column = columns[sort.removeprefix("-")]
+    keys = [(column, descending)]
+    if column is not primary_key:
+        keys.append((primary_key, descending))
+    return keys
@@ -0,0 +1,55 @@
+from datetime import date
+
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy.engine import Row
+
+from app.core.profiling import timed
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def default(value):
+    if isinstance(value, Row):
+        return value._asdict()
+    if isinstance(value, date):
+        return value.isoformat()
+    return DefaultJSONProvider.default(value)
+
+
+class JSONProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson when it is installed.
+
+    Dates and datetimes are written in ISO 8601 and SQLAlchemy rows as
+    objects, so list endpoints can return query rows without building ORM
+    instances. Falls back to the standard library with the same output.
+    """
+
+    def dumps(self, obj, **kwargs) -> str:
+        if orjson is None:
+            kwargs.setdefault("default", default)
+            return super().dumps(obj, **kwargs)
+        return self.dump_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def dump_bytes(self, obj) -> bytes:
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=default, option=option)
+
+    @timed("serialization")
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            self.dump_bytes(obj) + b"\n", mimetype=self.mimetype
+        )
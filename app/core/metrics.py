@@ -0,0 +1,151 @@
+import bisect
+import itertools
+import threading
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._function = None
+        self._lock = threading.Lock()
+
+    def set_function(self, function):
+        """Read the value from ``function`` whenever the metric is collected.
+
+        A metric with labels reads a dict of values by label values instead.
+        """
+        self._function = function
+
+    def samples(self):
+        if self._function is not None:
+            if self.labels:
+                return list(self._function().items())
+            return [((), self._function())]
+        with self._lock:
+            return list(self._values.items())
+
+    def series(self):
+        """Yield the ``(name, labels, value)`` of every series to render."""
+        for key, value in self.samples():
+            yield self.name, list(zip(self.labels, key)), value
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[label]) for label in self.labels)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    # Seconds, the defaults of the Prometheus clients.
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple = (),
+        buckets: tuple = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        with self._lock:
+            return [
+                (key, (list(counts), total))
+                for key, (counts, total) in self._values.items()
+            ]
+
+    def series(self):
+        for key, (counts, total) in self.samples():
+            labels = list(zip(self.labels, key))
+            # Buckets are cumulative, the last one is +Inf.
+            cumulative = list(itertools.accumulate(counts))
+            for bound, count in zip([*self.buckets, "+Inf"], cumulative):
+                yield f"{self.name}_bucket", [*labels, ("le", bound)], count
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative[-1]
+
+
+class MetricsRegistry:
+    """Process-local metrics rendered in the Prometheus text format.
+
+    Every gunicorn worker keeps its own values, so a scrape only reports the
+    worker that happened to serve it.
+    """
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name: str, documentation: str, labels: tuple = ()):
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: tuple = ()):
+        return self._register(Gauge(name, documentation, labels))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple = (),
+        buckets: tuple = Histogram.DEFAULT_BUCKETS,
+    ):
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def _register(self, metric: Metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.series():
+                labels = ",".join(
+                    f'{label}="{label_value}"' for label, label_value in labels
+                )
+                lines.append(
+                    f"{name}{{{labels}}} {value}" if labels else f"{name} {value}"
+                )
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,78 @@
+import base64
+import json
+
+from sqlalchemy import and_, or_, tuple_
+
+
+def encode_cursor(values: list) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError as error:
+        raise ValueError("Invalid cursor") from error
+
+    if isinstance(values, list):
+        return values
+    raise ValueError("Invalid cursor")
+
+
+def seek(keys: list, values: list):
+    """Build the WHERE clause selecting rows that come after ``values``.
+
+    ``keys`` is a list of ``(column, descending)`` pairs; the last one must be
+    unique so that the ordering is total.
+    """
+    if len({descending for _, descending in keys}) == 1:
+        columns = tuple_(*[column for column, _ in keys])
+        return columns < tuple_(*values) if keys[0][1] else columns > tuple_(*values)
+
+    clauses = []
+    for i, ((column, descending), value) in enumerate(zip(keys, values)):
+        previous = [c == v for (c, _), v in zip(keys[:i], values[:i])]
+        clauses.append(
+            and_(*previous, column < value if descending else column > value)
+        )
+    return or_(*clauses)
+
+
+def keys_signature(keys: list) -> str:
+    return ",".join(
+        f"-{column.key}" if descending else column.key for column, descending in keys
+    )
+
+
+def paginate(db_session, sql_query, keys: list, query):
+    """Apply keyset pagination to ``sql_query`` and run it.
+
+    Returns the page rows and the cursor of the next page, which is ``None``
+    on the last page. The keys must be among the selected columns. A cursor
+    records the keys it was made for and is rejected with any others.
+    """
+    if query.cursor is not None:
+        signature, *values = decode_cursor(query.cursor) or [None]
+        if signature != keys_signature(keys) or len(values) != len(keys):
+            raise ValueError("Invalid cursor")
+        sql_query = sql_query.where(seek(keys, values))
+
+    sql_query = sql_query.order_by(
+        *[column.desc() if descending else column.asc() for column, descending in keys]
+    ).offset(query.offset)
+    if query.limit:
+        sql_query = sql_query.limit(query.limit + 1)
+
+    items = db_session.execute(sql_query).all()
+
+    next_cursor = None
+    if query.limit and len(items) > query.limit:
+        items = items[: query.limit]
+        next_cursor = encode_cursor(
+            [
+                keys_signature(keys),
+                *[getattr(items[-1], column.key) for column, _ in keys],
+            ]
+        )
+
+    return items, next_cursor
@@ -0,0 +1,190 @@
+import cProfile
+import functools
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+from app.core.config import Config
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+LABELS = ("method", "endpoint")
+
+request_duration = registry.histogram(
+    "http_request_duration_seconds", "Time spent handling requests.", LABELS
+)
+section_duration = registry.histogram(
+    "http_request_section_duration_seconds",
+    "Time spent in each section of the requests.",
+    (*LABELS, "section"),
+)
+sql_statements = registry.histogram(
+    "http_request_sql_statements",
+    "SQL statements executed per request.",
+    LABELS,
+    buckets=(0, 1, 2, 3, 5, 10, 25, 50, 100),
+)
+
+# Only one cProfile profiler can collect at a time, so concurrent slow
+# requests are not all profiled.
+profiler_lock = threading.Lock()
+
+
+def profiling() -> bool:
+    return has_request_context() and "profile" in g
+
+
+def record_section(name: str, seconds: float):
+    g.profile[name] = g.profile.get(name, 0) + seconds
+
+
+@contextmanager
+def section(name: str):
+    """Add the time spent in the block to the ``name`` section of the request."""
+    if not profiling():
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_section(name, time.perf_counter() - started)
+
+
+def timed(name: str):
+    """Decorator form of ``section``."""
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with section(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def streaming(view):
+    """Mark a view whose response is streamed, and never profile it.
+
+    A profile holds the profiler of the worker until the request ends, which
+    for a stream can be hours.
+    """
+    view.streaming = True
+    return view
+
+
+def is_streaming() -> bool:
+    view = current_app.view_functions.get(request.endpoint)
+    return getattr(view, "streaming", False)
+
+
+class TimedQueuePool(QueuePool):
+    """Queue pool recording how long requests wait to check a connection out.
+
+    The time includes opening a new connection when the pool has to.
+    """
+
+    def _do_get(self):
+        with section("pool_wait"):
+            return super()._do_get()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def start_statement(conn, cursor, statement, parameters, context, executemany):
+    if profiling():
+        conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def end_statement(conn, cursor, statement, parameters, context, executemany):
+    if conn.info.get("profile_started") and profiling():
+        record_section("sql", time.perf_counter() - conn.info["profile_started"].pop())
+        g.profile_statements += 1
+
+
+@event.listens_for(Engine, "handle_error")
+def fail_statement(context):
+    # after_cursor_execute does not run for a failed statement.
+    if context.connection is not None and context.connection.info.get(
+        "profile_started"
+    ):
+        context.connection.info["profile_started"].pop()
+
+
+def start_request():
+    g.profile = {}
+    g.profile_statements = 0
+    g.profile_started = time.perf_counter()
+
+    if (
+        random.random() < Config.PROFILE_SAMPLE_RATE
+        and not is_streaming()
+        and profiler_lock.acquire(blocking=False)
+    ):
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+
+def end_request(exception=None):
+    if "profile" not in g:
+        return
+
+    duration = time.perf_counter() - g.profile_started
+    labels = {
+        "method": request.method,
+        "endpoint": request.url_rule.rule if request.url_rule else "unmatched",
+    }
+    request_duration.observe(duration, **labels)
+    sql_statements.observe(g.profile_statements, **labels)
+    for name, seconds in g.pop("profile").items():
+        section_duration.observe(seconds, section=name, **labels)
+
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.disable()
+        profiler_lock.release()
+        if duration >= Config.PROFILE_SLOW_THRESHOLD:
+            dump_profile(profiler, duration)
+
+
+def dump_profile(profiler: cProfile.Profile, duration: float):
+    os.makedirs(Config.PROFILE_DIRECTORY, exist_ok=True)
+    name = "{}-{}-{}.prof".format(
+        time.strftime("%Y%m%dT%H%M%S"),
+        request.endpoint or "unmatched",
+        int(duration * 1000),
+    )
+    path = os.path.join(Config.PROFILE_DIRECTORY, name)
+    profiler.dump_stats(path)
+    logger.warning(
+        "Profiled slow request %s %s (%.3fs) to %s",
+        request.method,
+        request.full_path,
+        duration,
+        path,
+    )
+
+
+def init_profiling(app):
+    """Record the timings of every request of ``app`` in the metrics.
+
+    Call it before the views are imported, so that the timings start before
+    their hooks, like the auth one, run. Teardown hooks run in reverse
+    order, so the timings end before close_request_session. A response
+    streamed with stream_with_context is timed until its end, any other
+    until its view returns.
+    """
+    app.before_request(start_request)
+    app.teardown_request(end_request)
@@ -0,0 +1,163 @@
+import functools
+import threading
+
+from flask import Response, make_response, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import Config
+from app.core.etag import not_modified, with_etag
+from app.core.metrics import registry
+from app.core.utils import uuidhex
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+cache_lookups = registry.counter(
+    "response_cache_lookups_total", "Response cache lookups.", ("result",)
+)
+cache_evictions = registry.counter(
+    "response_cache_evictions_total", "Entries evicted from the response cache."
+)
+
+
+class MemoryCacheBackend:
+    """Response cache local to the process."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.entries = TTLCache(maxsize, ttl)
+        self.tags = TTLCache(maxsize, ttl)
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        return self.entries.get(key)
+
+    def set(self, key: str, entry: tuple):
+        self.entries.set(key, entry)
+
+    def tag_token(self, tag: str) -> str:
+        with self._lock:
+            token = self.tags.get(tag)
+            if token is None:
+                token = uuidhex()
+                self.tags.set(tag, token)
+            return token
+
+    def invalidate(self, tags):
+        for tag in tags:
+            self.tags.delete(tag)
+
+    def evictions(self) -> int:
+        return self.entries.evictions
+
+
+class RedisCacheBackend:
+    """Response cache shared by all workers through Redis."""
+
+    def __init__(self, url: str, ttl: int):
+        if redis is None:
+            raise RuntimeError(
+                "The redis backend needs the redis extra: poetry install -E redis"
+            )
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get(self, key: str):
+        value = self.client.get(f"response:{key}")
+        if value is None:
+            return None
+
+        etag, body = value.split(b"\n", 1)
+        return body, etag.decode()
+
+    def set(self, key: str, entry: tuple):
+        body, etag = entry
+        self.client.set(f"response:{key}", etag.encode() + b"\n" + body, ex=self.ttl)
+
+    def tag_token(self, tag: str) -> str:
+        name = f"response-tag:{tag}"
+        token = self.client.get(name)
+        if token is None:
+            self.client.set(name, uuidhex(), ex=self.ttl, nx=True)
+            token = self.client.get(name) or uuidhex().encode()
+        return token.decode()
+
+    def invalidate(self, tags):
+        if tags:
+            self.client.delete(*[f"response-tag:{tag}" for tag in tags])
+
+    def evictions(self) -> int:
+        return self.client.info("stats")["evicted_keys"]
+
+
+def create_backend():
+    if Config.RESPONSE_CACHE_BACKEND == "memory":
+        return MemoryCacheBackend(Config.RESPONSE_CACHE_SIZE, Config.RESPONSE_CACHE_TTL)
+    if Config.RESPONSE_CACHE_BACKEND == "redis":
+        return RedisCacheBackend(Config.REDIS_URL, Config.RESPONSE_CACHE_TTL)
+    return None
+
+
+backend = create_backend()
+if backend is not None:
+    cache_evictions.set_function(backend.evictions)
+
+
+def cached(*tags: str):
+    """Cache the successful responses of a GET view.
+
+    Entries are keyed by the request path and query string and by the
+    current token of each of ``tags``, which are formatted with the view
+    arguments. Invalidating a tag replaces its token, so every entry built
+    under the old one stops being served. The tokens are read before the
+    view runs, so a response built from data that a concurrent write has
+    since replaced is stored under a token that is already gone.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(**kwargs):
+            if backend is None:
+                return view(**kwargs)
+
+            tokens = [backend.tag_token(tag.format(**kwargs)) for tag in tags]
+            key = ":".join([request.full_path, *tokens])
+            entry = backend.get(key)
+            if entry is not None:
+                cache_lookups.inc(result="hit")
+                body, etag = entry
+                return not_modified(etag) or with_etag(
+                    Response(body, mimetype="application/json"), etag
+                )
+
+            cache_lookups.inc(result="miss")
+            response = make_response(view(**kwargs))
+            etag, _ = response.get_etag()
+            if response.status_code == 200 and etag:
+                backend.set(key, (response.get_data(), etag))
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def invalidate_cache(db_session, *tags: str):
+    """Invalidate ``tags`` once the transaction of ``db_session`` commits."""
+    db_session.info.setdefault("cache_tags", set()).update(tags)
+
+
+@event.listens_for(Session, "after_commit")
+def invalidate_committed(db_session):
+    tags = db_session.info.pop("cache_tags", None)
+    if tags and backend is not None:
+        backend.invalidate(tags)
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_invalidations(db_session):
+    db_session.info.pop("cache_tags", None)
@@ -0,0 +1,69 @@
+from sqlalchemy import literal_column
+from sqlalchemy.dialects.postgresql import insert
+
+
+def upsert_rows(db_session, table, rows: list, update_columns: list, where=None):
+    """Insert ``rows`` relying on the unique ``name`` constraint of ``table``.
+
+    With ``update_columns`` an existing row with the same name is updated
+    (only where ``where`` holds, if given) and its ``version`` column, if any,
+    is bumped; otherwise it is left alone.
+    Returns one result per input row: its status ("created", "updated" or
+    "conflict") and its primary key if it was written. Rows repeating a name
+    already seen earlier in the batch are reported as conflicts.
+    """
+    primary_key = table.primary_key.columns[0]
+    unique_rows = {}
+    for row in rows:
+        unique_rows.setdefault(row["name"], row)
+
+    statement = insert(table)
+    if update_columns:
+        set_ = {name: statement.excluded[name] for name in update_columns}
+        if "version" in table.c:
+            set_["version"] = table.c.version + 1
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.name],
+            set_=set_,
+            where=where(statement.excluded) if where else None,
+        )
+    else:
+        statement = statement.on_conflict_do_nothing(index_elements=[table.c.name])
+
+    written = {}
+    if unique_rows:
+        written = {
+            row.name: row
+            for row in db_session.execute(
+                statement.returning(
+                    primary_key,
+                    table.c.name,
+                    literal_column("xmax = 0").label("created"),
+                ),
+                list(unique_rows.values()),
+            )
+        }
+
+    results = []
+    for row in rows:
+        result = written.get(row["name"])
+        if result is None or unique_rows[row["name"]] is not row:
+            results.append({"name": row["name"], "status": "conflict"})
+        else:
+            results.append(
+                {
+                    "name": row["name"],
+                    primary_key.key: result[0],
+                    "status": "created" if result.created else "updated",
+                }
+            )
+    return results
+
+
+def summarize_upsert(results: list):
+    return {
+        "results": results,
+        "created": sum(1 for result in results if result["status"] == "created"),
+        "updated": sum(1 for result in results if result["status"] == "updated"),
+        "conflicts": sum(1 for result in results if result["status"] == "conflict"),
+    }
@@ -1,10 +1,25 @@
 from flask import Flask
 
 from app.core.config import Config
+from app.core.database import close_request_session
+from app.core.json import JSONProvider
+from app.core.profiling import init_profiling
 
 app = Flask("consumables_app")
 app.config.from_object(Config)
+app.json = JSONProvider(app)
+app.teardown_request(close_request_session)
+if Config.PROFILING:
+    init_profiling(app)
 
+from app.api.alerts.handlers import *  # noqa
+from app.api.analytics.commands import *  # noqa
+from app.api.analytics.handlers import *  # noqa
+from app.api.auth.commands import *  # noqa
 from app.api.auth.handlers import *  # noqa
+from app.api.consumable.commands import *  # noqa
 from app.api.consumable.handlers import *  # noqa
 from app.api.consumable_category.handlers import *  # noqa
+from app.api.events.handlers import *  # noqa
+from app.api.metrics.handlers import *  # noqa
+from app.api.search.handlers import *  # noqa
@@ -1,12 +1,27 @@
 from datetime import date, datetime
+from functools import reduce
+from typing import Literal
 
-from pydantic import BaseModel, Field
-from sqlalchemy import CheckConstraint, ForeignKey
+from pydantic import BaseModel, Field, model_validator
+from sqlalchemy import (
+    BigInteger,
+    CheckConstraint,
+    ForeignKey,
+    Index,
+    cast,
+    func,
+    literal,
+    text,
+)
+from sqlalchemy.dialects.postgresql import REGCONFIG
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.utils import uuidhex
 from app.models.base import Base
 
+# Quantities and movements are stored as PostgreSQL integers.
+MAX_QUANTITY = 2**31 - 1
+
 
 class POSTConsumableCategory(BaseModel):
     name: str
@@ -15,53 +30,221 @@ class POSTConsumableCategory(BaseModel):
 
 class POSTConsumable(BaseModel):
     name: str
-    quantity: int = Field(ge=0)
+    quantity: int = Field(ge=0, le=MAX_QUANTITY)
     description: str | None = None
+    min_quantity: int | None = Field(None, ge=0, le=MAX_QUANTITY)
 
 
 class POSTConsumableHistory(BaseModel):
-    modified_count: int
+    modified_count: int = Field(ge=-MAX_QUANTITY, le=MAX_QUANTITY)
     description: str | None = None
 
 
+class POSTConsumableMovement(POSTConsumableHistory):
+    consumable_id: str
+
+
+class POSTBatchParams(BaseModel):
+    on_conflict: Literal["ignore", "update"] = "ignore"
+
+
 class GETListParams(BaseModel):
     offset: int = Field(0, ge=0)
     limit: int | None = Field(None, gt=0)
+    cursor: str | None = None
+
+
+class GETEmbedParams(BaseModel):
+    include: str | None = None
+    category_fields: str | None = Field(None, alias="fields[categories]")
+    consumable_fields: str | None = Field(None, alias="fields[consumables]")
+    history_fields: str | None = Field(None, alias="fields[history]")
+    # Latest history rows embedded per consumable.
+    history_limit: int = Field(1, gt=0, le=100)
+
+
+class GETCategoryListParams(GETListParams):
+    name_prefix: str | None = None
+    created_since: date | None = None
+    created_until: date | None = None
+    sort: Literal[
+        "category_id",
+        "-category_id",
+        "name",
+        "-name",
+        "created_at",
+        "-created_at",
+    ] = "category_id"
+
+
+class GETConsumableListParams(GETListParams, GETEmbedParams):
+    name_prefix: str | None = None
+    quantity_min: int | None = None
+    quantity_max: int | None = None
+    created_since: date | None = None
+    created_until: date | None = None
+    sort: Literal[
+        "consumable_id",
+        "-consumable_id",
+        "name",
+        "-name",
+        "quantity",
+        "-quantity",
+        "created_at",
+        "-created_at",
+    ] = "consumable_id"
+
+
+class GETHistoryListParams(GETListParams):
+    since: datetime | None = None
+    until: datetime | None = None
+    direction: Literal["in", "out"] | None = None
+    sort: Literal[
+        "history_id",
+        "-history_id",
+        "modified_time",
+        "-modified_time",
+    ] = "-history_id"
+
+
+class GETHistoryExportParams(BaseModel):
+    format: Literal["ndjson", "csv"] = "ndjson"
+    since: datetime | None = None
+    until: datetime | None = None
+
+
+class GETMovementStatsParams(BaseModel):
+    since: datetime
+    until: datetime
+    bucket: Literal["hour", "day", "week"] = "day"
+    group_by: Literal["consumable", "category", "total"] = "consumable"
+    category_id: str | None = None
+    consumable_id: str | None = None
+
+    @model_validator(mode="after")
+    def check_range(self):
+        if self.since > self.until:
+            raise ValueError("since must not be after until")
+        return self
+
+
+class GETStockParams(BaseModel):
+    at: datetime
+
+
+class GETEventsParams(BaseModel):
+    category_id: str | None = None
+    consumable_id: str | None = None
+
+
+class GETAlertsParams(GETListParams):
+    state: Literal["open", "closed", "all"] = "open"
+    category_id: str | None = None
+
+
+class GETSearchParams(GETListParams):
+    q: str = Field(min_length=1, max_length=200)
+    scope: Literal["consumables", "categories"] = "consumables"
+    limit: int = Field(20, gt=0, le=100)
+
+
+def search_document(*weighted_columns):
+    """Full-text document of ``(column, weight)`` pairs.
+
+    Queries have to build it the same way as the GIN indexes on it for the
+    planner to use them.
+    """
+    return reduce(
+        lambda document, other: document.op("||")(other),
+        [
+            func.setweight(
+                func.to_tsvector(
+                    cast(literal("simple"), REGCONFIG), func.coalesce(column, "")
+                ),
+                weight,
+            )
+            for column, weight in weighted_columns
+        ],
+    )
 
 
 class ConsumableCategory(Base):
     __tablename__ = "consumable_categories"
+    __table_args__ = (
+        Index(
+            "ix_consumable_categories_created_at_category_id",
+            "created_at",
+            "category_id",
+        ),
+    )
 
     category_id: Mapped[str] = mapped_column(default=uuidhex, primary_key=True)
     name: Mapped[str] = mapped_column(unique=True)
     description: Mapped[str | None] = mapped_column()
     created_at: Mapped[date] = mapped_column(default=date.today)
+    # Bumped on every change, it identifies the representation for ETags.
+    version: Mapped[int] = mapped_column(default=1, server_default="1")
 
     consumables: Mapped[list["Consumable"]] = relationship(
         "Consumable", back_populates="consumable_category"
     )
 
+    @classmethod
+    def json_columns(cls):
+        return [
+            cls.category_id,
+            cls.name,
+            cls.description,
+            cls.created_at,
+            cls.version,
+        ]
+
     def to_dict(self):
         return {
             "category_id": self.category_id,
             "name": self.name,
             "description": self.description,
-            "created_at": self.created_at.isoformat(),
+            "created_at": self.created_at,
+            "version": self.version,
         }
 
 
 class Consumable(Base):
     __tablename__ = "consumables"
+    # One index per sortable column of the category listing, ending with the
+    # primary key that breaks ties in the keyset.
+    __table_args__ = (
+        Index(
+            "ix_consumables_category_id_name", "category_id", "name", "consumable_id"
+        ),
+        Index(
+            "ix_consumables_category_id_quantity",
+            "category_id",
+            "quantity",
+            "consumable_id",
+        ),
+        Index(
+            "ix_consumables_category_id_created_at",
+            "category_id",
+            "created_at",
+            "consumable_id",
+        ),
+    )
 
     consumable_id: Mapped[str] = mapped_column(default=uuidhex, primary_key=True)
-    name: Mapped[str] = mapped_column()
+    name: Mapped[str] = mapped_column(unique=True)
     quantity: Mapped[int] = mapped_column(CheckConstraint("quantity >= 0"))
+    # Reorder point, an alert is open while the quantity is below it.
+    min_quantity: Mapped[int | None] = mapped_column(
+        CheckConstraint("min_quantity >= 0")
+    )
 
     description: Mapped[str | None] = mapped_column()
     created_at: Mapped[date] = mapped_column(default=date.today)
+    version: Mapped[int] = mapped_column(default=1, server_default="1")
 
     category_id: Mapped[str] = mapped_column(
-        ForeignKey("consumable_categories.category_id")
+        ForeignKey("consumable_categories.category_id"), index=True
     )
     consumable_category: Mapped["ConsumableCategory"] = relationship(
         "ConsumableCategory", back_populates="consumables"
@@ -71,23 +254,62 @@ class Consumable(Base):
         "ConsumableHistory", back_populates="consumable"
     )
 
+    @classmethod
+    def json_columns(cls):
+        return [
+            cls.consumable_id,
+            cls.name,
+            cls.quantity,
+            cls.min_quantity,
+            cls.description,
+            cls.created_at,
+            cls.category_id,
+            cls.version,
+        ]
+
     def to_dict(self):
         return {
             "consumable_id": self.consumable_id,
             "name": self.name,
             "quantity": self.quantity,
+            "min_quantity": self.min_quantity,
             "description": self.description,
-            "created_at": self.created_at.isoformat(),
+            "created_at": self.created_at,
             "category_id": self.category_id,
+            "version": self.version,
         }
 
 
 class ConsumableHistory(Base):
     __tablename__ = "consumable_history"
+    __table_args__ = (
+        Index(
+            "ix_consumable_history_consumable_id_history_id",
+            "consumable_id",
+            text("history_id DESC"),
+        ),
+        Index(
+            "ix_consumable_history_consumable_id_modified_time",
+            "consumable_id",
+            "modified_time",
+        ),
+        Index(
+            "ix_consumable_history_modified_time",
+            "modified_time",
+            postgresql_using="brin",
+        ),
+        {"postgresql_partition_by": "RANGE (modified_time)"},
+    )
 
-    history_id: Mapped[int] = mapped_column(primary_key=True)
+    history_id: Mapped[int] = mapped_column(
+        BigInteger, primary_key=True, autoincrement=True
+    )
     modified_count: Mapped[int] = mapped_column()
-    modified_time: Mapped[datetime] = mapped_column(default=datetime.now)
+    # Part of the primary key because the table is partitioned by it, which
+    # also lets deletes by primary key prune partitions.
+    modified_time: Mapped[datetime] = mapped_column(
+        default=datetime.now, primary_key=True
+    )
     description: Mapped[str | None] = mapped_column()
 
     consumable_id: Mapped[str] = mapped_column(ForeignKey("consumables.consumable_id"))
@@ -95,11 +317,100 @@ class ConsumableHistory(Base):
         "Consumable", back_populates="history"
     )
 
+    @classmethod
+    def json_columns(cls):
+        return [
+            cls.history_id,
+            cls.modified_count,
+            func.coalesce(cls.description, "").label("description"),
+            cls.modified_time,
+            cls.consumable_id,
+        ]
+
     def to_dict(self):
         return {
             "history_id": self.history_id,
             "modified_count": self.modified_count,
             "description": self.description or "",
-            "modified_time": self.modified_time.isoformat(),
+            "modified_time": self.modified_time,
             "consumable_id": self.consumable_id,
         }
+
+
+class ConsumableDailyStats(Base):
+    __tablename__ = "consumable_daily_stats"
+
+    consumable_id: Mapped[str] = mapped_column(
+        ForeignKey("consumables.consumable_id", ondelete="CASCADE"), primary_key=True
+    )
+    day: Mapped[date] = mapped_column(primary_key=True)
+    inflow: Mapped[int] = mapped_column(default=0)
+    outflow: Mapped[int] = mapped_column(default=0)
+    movement_count: Mapped[int] = mapped_column(default=0)
+    closing_quantity: Mapped[int] = mapped_column()
+
+
+class StockAlert(Base):
+    __tablename__ = "stock_alerts"
+    __table_args__ = (
+        # At most one open alert per consumable.
+        Index(
+            "ix_stock_alerts_open_consumable_id",
+            "consumable_id",
+            unique=True,
+            postgresql_where=text("closed_at IS NULL"),
+        ),
+        # Lists the open alerts in their page order without visiting the
+        # closed ones.
+        Index(
+            "ix_stock_alerts_open_alert_id",
+            "alert_id",
+            postgresql_where=text("closed_at IS NULL"),
+        ),
+    )
+
+    alert_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    consumable_id: Mapped[str] = mapped_column(
+        ForeignKey("consumables.consumable_id", ondelete="CASCADE")
+    )
+    quantity: Mapped[int] = mapped_column()
+    min_quantity: Mapped[int] = mapped_column()
+    opened_at: Mapped[datetime] = mapped_column(default=datetime.now)
+    closed_at: Mapped[datetime | None] = mapped_column()
+
+    @classmethod
+    def json_columns(cls):
+        return [
+            cls.alert_id,
+            cls.consumable_id,
+            cls.quantity,
+            cls.min_quantity,
+            cls.opened_at,
+            cls.closed_at,
+        ]
+
+
+Index(
+    "ix_consumable_categories_search",
+    search_document((ConsumableCategory.__table__.c.name, "A")),
+    postgresql_using="gin",
+)
+Index(
+    "ix_consumable_categories_name_trgm",
+    ConsumableCategory.name,
+    postgresql_using="gin",
+    postgresql_ops={"name": "gin_trgm_ops"},
+)
+Index(
+    "ix_consumables_search",
+    search_document(
+        (Consumable.__table__.c.name, "A"), (Consumable.__table__.c.description, "B")
+    ),
+    postgresql_using="gin",
+)
+Index(
+    "ix_consumables_name_trgm",
+    Consumable.name,
+    postgresql_using="gin",
+    postgresql_ops={"name": "gin_trgm_ops"},
+)
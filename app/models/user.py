@@ -46,7 +46,7 @@ class User(Base):
             "first_name": self.first_name,
             "last_name": self.last_name,
             "middle_name": self.middle_name,
-            "created_at": self.created_at.isoformat(),
+            "created_at": self.created_at,
             "role": self.role.value,
         }
 
@@ -55,8 +55,16 @@ class UserSession(Base):
     __tablename__ = "user_sessions"
 
     session_id: Mapped[str] = mapped_column(default=uuidhex, primary_key=True)
-    user_id: Mapped[str] = mapped_column(ForeignKey("users.user_id"))
+    user_id: Mapped[str] = mapped_column(ForeignKey("users.user_id"), index=True)
     user: Mapped["User"] = relationship("User", back_populates="session")
 
     created_at: Mapped[datetime] = mapped_column(default=lambda: datetime.now(UTC))
-    expiration_at: Mapped[datetime] = mapped_column()
+    expiration_at: Mapped[datetime] = mapped_column(index=True)
+
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+
+    token_id: Mapped[str] = mapped_column(primary_key=True)
+    # Rows are useless once the token has expired anyway.
+    expiration_at: Mapped[datetime] = mapped_column(index=True)
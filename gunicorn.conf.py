@@ -0,0 +1,60 @@
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("GUNICORN_WORKERS", "1"))
+# "gthread" serves GUNICORN_THREADS requests concurrently per worker,
+# overlapping their database I/O, and keeps long streams like /events from
+# hitting the worker timeout. "sync" serves one request per worker at a time.
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.environ.get("GUNICORN_THREADS", "16"))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "30"))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", "2"))
+
+accesslog = "-"
+errorlog = "-"
+
+# Every thread may hold a connection for the whole request, so the pool of
+# each worker has to be at least as large as its thread count.
+os.environ.setdefault("DB_POOL_SIZE", str(max(threads, 5)))
+
+# Every /events subscriber holds a thread for as long as it stays connected,
+# so a worker only gives half of its threads to them, and none with a single
+# thread: /events answers 503 there. For many subscribers, run a separate
+# gunicorn process with more threads that the proxy routes /events to, e.g.
+#   GUNICORN_THREADS=200 gunicorn -c gunicorn.conf.py app.main:app
+os.environ.setdefault("EVENTS_MAX_SUBSCRIBERS", str(threads // 2))
+
+
+def on_starting(server):
+    from app.core.config import Config
+
+    # The in-memory response cache is invalidated only in the worker that made
+    # the change, so it would serve stale data from the others.
+    if server.cfg.workers > 1 and Config.RESPONSE_CACHE_BACKEND == "memory":
+        raise RuntimeError("The memory response cache needs a single worker")
+
+    from app.api.consumable.helpers import create_history_partitions
+    from app.core.database import engine, session_maker
+
+    # Rows of a month without a partition land in the default one, after
+    # which its partition can no longer be created.
+    with session_maker() as db_session:
+        created = create_history_partitions(
+            db_session, Config.HISTORY_PARTITION_MONTHS_AHEAD
+        )
+        db_session.commit()
+    for name in created:
+        server.log.info("Created history partition %s", name)
+    # The forked workers open their own connections.
+    engine.dispose()
+
+
+def post_fork(server, worker):
+    # Loaded before the worker serves anything, so that checking a signed
+    # token never waits for the database.
+    from app.core.config import Config
+
+    if Config.SIGNED_TOKENS:
+        from app.api.auth.helpers import revoked_tokens
+
+        revoked_tokens.start()
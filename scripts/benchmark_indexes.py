@@ -0,0 +1,152 @@
+"""Compare query plans and latencies with and without the lookup indexes.
+
+Seeds a synthetic dataset, runs the hot queries with the indexes from
+revision b71e3f90c5a8 dropped and then recreated, and prints the plan and
+median execution time of each. Everything happens in one transaction that
+is rolled back at the end, so the database is left as it was, but the
+tables are locked while it runs: point it at a development database.
+
+    python -m scripts.benchmark_indexes --consumables 20000 --history 1000000
+"""
+
+import argparse
+import statistics
+
+from sqlalchemy import text
+
+from app.core.database import engine
+
+INDEXES = {
+    "ix_consumables_category_id": "ON consumables (category_id)",
+    "ix_consumable_history_consumable_id_history_id": (
+        "ON consumable_history (consumable_id, history_id DESC)"
+    ),
+    "ix_user_sessions_user_id": "ON user_sessions (user_id)",
+}
+
+QUERIES = {
+    "consumables by category": (
+        "SELECT * FROM consumables WHERE category_id = 'bench-cat-1' "
+        "ORDER BY consumable_id LIMIT 50"
+    ),
+    "history page": (
+        "SELECT * FROM consumable_history WHERE consumable_id = 'bench-c-1' "
+        "ORDER BY history_id DESC LIMIT 50"
+    ),
+    "consumable by name": "SELECT * FROM consumables WHERE name = 'bench-c-1'",
+    "login session delete": (
+        "DELETE FROM user_sessions WHERE user_id = 'bench-user-1'"
+    ),
+}
+
+
+def seed(connection, args):
+    connection.execute(
+        text(
+            "INSERT INTO consumable_categories (category_id, name, created_at) "
+            "SELECT 'bench-cat-' || i, 'bench-cat-' || i, current_date "
+            "FROM generate_series(1, :n) i"
+        ),
+        {"n": args.categories},
+    )
+    connection.execute(
+        text(
+            "INSERT INTO consumables "
+            "(consumable_id, name, quantity, created_at, category_id) "
+            "SELECT 'bench-c-' || i, 'bench-c-' || i, 1000000, current_date, "
+            "'bench-cat-' || (i % :categories + 1) "
+            "FROM generate_series(1, :n) i"
+        ),
+        {"n": args.consumables, "categories": args.categories},
+    )
+    connection.execute(
+        text(
+            "INSERT INTO consumable_history "
+            "(modified_count, modified_time, consumable_id) "
+            "SELECT 1, now() - i * interval '1 second', "
+            "'bench-c-' || (i % :consumables + 1) "
+            "FROM generate_series(1, :n) i"
+        ),
+        {"n": args.history, "consumables": args.consumables},
+    )
+    connection.execute(
+        text(
+            "INSERT INTO users (user_id, email, first_name, last_name, "
+            "hashed_password, created_at, role) "
+            "SELECT 'bench-user-' || i, 'bench-' || i || '@example.com', "
+            "'Bench', 'User', '', current_date, 'WORKER' "
+            "FROM generate_series(1, :n) i"
+        ),
+        {"n": args.users},
+    )
+    connection.execute(
+        text(
+            "INSERT INTO user_sessions "
+            "(session_id, user_id, created_at, expiration_at) "
+            "SELECT 'bench-session-' || i, 'bench-user-' || (i % :users + 1), "
+            "now(), now() + interval '1 day' "
+            "FROM generate_series(1, :n) i"
+        ),
+        {"n": args.sessions, "users": args.users},
+    )
+    connection.execute(text("ANALYZE"))
+
+
+def measure(connection, runs: int):
+    results = {}
+    for name, query in QUERIES.items():
+        timings = []
+        for _ in range(runs):
+            connection.execute(text("SAVEPOINT bench"))
+            plan = connection.execute(
+                text(f"EXPLAIN (ANALYZE, FORMAT JSON) {query}")
+            ).scalar()[0]
+            connection.execute(text("ROLLBACK TO SAVEPOINT bench"))
+            timings.append(plan["Execution Time"])
+        results[name] = (describe(plan["Plan"]), statistics.median(timings))
+    return results
+
+
+def describe(node) -> str:
+    label = node["Node Type"]
+    if "Index Name" in node:
+        label += f" using {node['Index Name']}"
+    children = ", ".join(describe(child) for child in node.get("Plans", []))
+    return f"{label} ({children})" if children else label
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--categories", type=int, default=200)
+    parser.add_argument("--consumables", type=int, default=20000)
+    parser.add_argument("--history", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--sessions", type=int, default=50000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            seed(connection, args)
+
+            for name in INDEXES:
+                connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+            before = measure(connection, args.runs)
+
+            for name, definition in INDEXES.items():
+                connection.execute(text(f"CREATE INDEX {name} {definition}"))
+            connection.execute(text("ANALYZE"))
+            after = measure(connection, args.runs)
+        finally:
+            transaction.rollback()
+
+    for name in QUERIES:
+        (plan_before, ms_before), (plan_after, ms_after) = before[name], after[name]
+        print(name)
+        print(f"  before: {ms_before:9.3f} ms  {plan_before}")
+        print(f"  after:  {ms_after:9.3f} ms  {plan_after}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Fixtures of the test suite.
+
+The tests run against the database the app is configured with, migrated
+with ``alembic upgrade head``. Nothing is cleaned up: every test works on
+its own users, categories and consumables, named uniquely.
+"""
+
+import uuid
+
+import pytest
+from sqlalchemy import update
+
+from app.core.database import session_maker
+from app.main import app
+from app.models.user import Role, User
+
+
+def unique(prefix: str) -> str:
+    return f"{prefix}-{uuid.uuid4().hex[:12]}"
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+@pytest.fixture
+def db_session():
+    """A session whose changes are rolled back after the test."""
+    with session_maker() as db_session:
+        yield db_session
+        db_session.rollback()
+
+
+@pytest.fixture
+def admin(client):
+    """A client logged in as an admin."""
+    email = f"{unique('admin')}@example.com"
+    credentials = {"email": email, "password": "password123"}
+    response = client.post(
+        "/auth/register", json={**credentials, "first_name": "A", "last_name": "B"}
+    )
+    assert response.status_code == 201
+    with session_maker() as db_session:
+        db_session.execute(
+            update(User).where(User.email == email).values(role=Role.ADMIN)
+        )
+        db_session.commit()
+
+    response = client.post("/auth/login", json=credentials)
+    assert response.status_code == 200
+    return client
+
+
+@pytest.fixture
+def make_category(admin):
+    """Create a category and return its id."""
+
+    def make() -> str:
+        response = admin.post("/categories", json={"name": unique("category")})
+        assert response.status_code == 201
+        return response.json["category"]["category_id"]
+
+    return make
+
+
+@pytest.fixture
+def category(make_category) -> str:
+    return make_category()
+
+
+@pytest.fixture
+def make_consumable(admin, category):
+    """Create a consumable in ``category`` and return its representation."""
+
+    def make(quantity: int = 10, **fields) -> dict:
+        response = admin.post(
+            f"/categories/{category}/consumables",
+            json={"name": unique("consumable"), "quantity": quantity, **fields},
+        )
+        assert response.status_code == 201
+        return response.json["consumable"]
+
+    return make
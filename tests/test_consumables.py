@@ -0,0 +1,100 @@
+def consumable_url(consumable: dict) -> str:
+    return (
+        f"/categories/{consumable['category_id']}"
+        f"/consumables/{consumable['consumable_id']}"
+    )
+
+
+def movements(client, consumable: dict) -> list:
+    history = client.get(f"{consumable_url(consumable)}/history").json["history"]
+    return [(row["modified_count"], row["description"]) for row in history]
+
+
+def test_names_are_unique_across_categories(admin, make_category, make_consumable):
+    consumable = make_consumable()
+
+    response = admin.post(
+        f"/categories/{make_category()}/consumables",
+        json={"name": consumable["name"], "quantity": 1},
+    )
+
+    assert response.status_code == 400
+    assert response.json == {"error": "Consumable already exists"}
+
+
+def test_rename_to_an_existing_name_is_rejected(admin, make_consumable):
+    first, second = make_consumable(), make_consumable()
+
+    response = admin.put(
+        consumable_url(second), json={"name": first["name"], "quantity": 1}
+    )
+
+    assert response.status_code == 400
+    assert response.json == {"error": "Consumable already exists"}
+    unchanged = admin.get(consumable_url(second)).json["consumable"]
+    assert (unchanged["name"], unchanged["quantity"]) == (second["name"], 10)
+
+
+def test_update_logs_the_quantity_change_as_a_movement(admin, make_consumable):
+    consumable = make_consumable(10)
+
+    for quantity in [4, 4, 6]:
+        response = admin.put(
+            consumable_url(consumable),
+            json={"name": consumable["name"], "quantity": quantity},
+        )
+        assert response.status_code == 200
+
+    assert movements(admin, consumable) == [(2, "Set by update"), (-6, "Set by update")]
+
+
+def test_batch_ignores_existing_names(admin, category, make_consumable):
+    existing = make_consumable(10)
+    name = f"{existing['name']}-new"
+
+    response = admin.post(
+        f"/categories/{category}/consumables/batch",
+        json=[
+            {"name": existing["name"], "quantity": 1},
+            {"name": name, "quantity": 2},
+            {"name": name, "quantity": 3},
+        ],
+    )
+
+    assert response.status_code == 200
+    assert (response.json["created"], response.json["conflicts"]) == (1, 2)
+    assert admin.get(consumable_url(existing)).json["consumable"]["quantity"] == 10
+
+
+def test_batch_update_logs_the_quantity_change_as_a_movement(
+    admin, category, make_consumable
+):
+    changed, unchanged = make_consumable(10), make_consumable(5)
+
+    response = admin.post(
+        f"/categories/{category}/consumables/batch?on_conflict=update",
+        json=[
+            {"name": changed["name"], "quantity": 7},
+            {"name": unchanged["name"], "quantity": 5},
+        ],
+    )
+
+    assert response.status_code == 200
+    assert response.json["updated"] == 2
+    assert admin.get(consumable_url(changed)).json["consumable"]["quantity"] == 7
+    assert movements(admin, changed) == [(-3, "Set by batch update")]
+    assert movements(admin, unchanged) == []
+
+
+def test_batch_update_leaves_other_categories_alone(
+    admin, make_category, make_consumable
+):
+    consumable = make_consumable(10)
+
+    response = admin.post(
+        f"/categories/{make_category()}/consumables/batch?on_conflict=update",
+        json=[{"name": consumable["name"], "quantity": 1}],
+    )
+
+    assert response.json["conflicts"] == 1
+    assert admin.get(consumable_url(consumable)).json["consumable"]["quantity"] == 10
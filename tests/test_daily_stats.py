@@ -0,0 +1,120 @@
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import select, update
+
+from app.api.analytics.helpers import rebuild_daily_stats
+from app.models.consumable import Consumable, ConsumableDailyStats, ConsumableHistory
+
+
+def history_url(consumable: dict) -> str:
+    return (
+        f"/categories/{consumable['category_id']}"
+        f"/consumables/{consumable['consumable_id']}/history"
+    )
+
+
+def daily_stats(db_session, consumable_id: str) -> dict:
+    rows = db_session.scalars(
+        select(ConsumableDailyStats).where(
+            ConsumableDailyStats.consumable_id == consumable_id
+        )
+    )
+    return {
+        row.day: (row.inflow, row.outflow, row.movement_count, row.closing_quantity)
+        for row in rows
+    }
+
+
+def days_ago(days: int) -> date:
+    return date.today() - timedelta(days=days)
+
+
+def test_movements_and_updates_are_rolled_up(admin, db_session, make_consumable):
+    consumable = make_consumable(10)
+
+    admin.post(history_url(consumable), json={"modified_count": 5})
+    admin.post(history_url(consumable), json={"modified_count": -3})
+    admin.put(
+        history_url(consumable).removesuffix("/history"),
+        json={"name": consumable["name"], "quantity": 20},
+    )
+
+    assert daily_stats(db_session, consumable["consumable_id"]) == {
+        date.today(): (13, 3, 3, 20)
+    }
+
+
+def test_deleted_movement_is_taken_off_the_day(admin, db_session, make_consumable):
+    consumable = make_consumable(10)
+    response = admin.post(history_url(consumable), json={"modified_count": 5})
+
+    admin.delete(
+        f"{history_url(consumable)}/{response.json['history'][0]['history_id']}"
+    )
+
+    inflow, outflow, movement_count, _ = daily_stats(
+        db_session, consumable["consumable_id"]
+    )[date.today()]
+    assert (inflow, outflow, movement_count) == (0, 0, 0)
+
+
+def test_rebuild_after_an_update_changes_nothing(admin, db_session, make_consumable):
+    consumable = make_consumable(10)
+    admin.post(history_url(consumable), json={"modified_count": -4})
+    admin.put(
+        history_url(consumable).removesuffix("/history"),
+        json={"name": consumable["name"], "quantity": 2},
+    )
+    before = daily_stats(db_session, consumable["consumable_id"])
+
+    rebuild_daily_stats(db_session)
+
+    assert daily_stats(db_session, consumable["consumable_id"]) == before
+
+
+def test_rebuild_keeps_the_days_without_history(db_session, make_consumable):
+    consumable_id = make_consumable(5)["consumable_id"]
+    db_session.execute(
+        update(Consumable)
+        .where(Consumable.consumable_id == consumable_id)
+        .values(created_at=days_ago(7))
+    )
+    # Created empty 7 days ago, set to 7 without a movement 5 days ago, with
+    # the movements of 6, 3 and 1 days ago. Those of 6 and 3 days ago were
+    # rolled up wrongly.
+    for days, modified_count in [(6, 2), (3, 1), (1, -3)]:
+        db_session.add(
+            ConsumableHistory(
+                consumable_id=consumable_id,
+                modified_count=modified_count,
+                modified_time=datetime.combine(days_ago(days), time(12)),
+            )
+        )
+    for days, movement_count, closing_quantity in [
+        (7, 0, 0),
+        (6, 4, 99),
+        (5, 0, 7),
+        (3, 9, 99),
+    ]:
+        db_session.add(
+            ConsumableDailyStats(
+                consumable_id=consumable_id,
+                day=days_ago(days),
+                inflow=0,
+                outflow=0,
+                movement_count=movement_count,
+                closing_quantity=closing_quantity,
+            )
+        )
+    db_session.flush()
+
+    rebuild_daily_stats(db_session)
+
+    assert daily_stats(db_session, consumable_id) == {
+        days_ago(7): (0, 0, 0, 0),
+        days_ago(6): (2, 0, 1, 2),
+        days_ago(5): (0, 0, 0, 7),
+        days_ago(3): (1, 0, 1, 8),
+        days_ago(1): (0, 3, 1, 5),
+        date.today(): (0, 0, 0, 5),
+    }
@@ -0,0 +1,45 @@
+def consumable_url(consumable: dict) -> str:
+    return (
+        f"/categories/{consumable['category_id']}"
+        f"/consumables/{consumable['consumable_id']}"
+    )
+
+
+def test_unchanged_consumable_is_not_modified(admin, make_consumable):
+    url = consumable_url(make_consumable())
+    etag = admin.get(url).get_etag()[0]
+
+    response = admin.get(url, headers={"If-None-Match": f'"{etag}"'})
+
+    assert response.status_code == 304
+    assert response.get_etag()[0] == etag
+
+
+def test_movement_changes_the_etag(admin, make_consumable):
+    url = consumable_url(make_consumable())
+    etag = admin.get(url).get_etag()[0]
+
+    admin.post(f"{url}/history", json={"modified_count": 1})
+    response = admin.get(url, headers={"If-None-Match": f'"{etag}"'})
+
+    assert response.status_code == 200
+    assert response.json["consumable"]["quantity"] == 11
+    assert response.get_etag()[0] != etag
+
+
+def test_list_etag_changes_with_its_consumables(admin, category, make_consumable):
+    url = consumable_url(make_consumable())
+    list_url = f"/categories/{category}/consumables?include=history"
+    etag = admin.get(list_url).get_etag()[0]
+    assert (
+        admin.get(list_url, headers={"If-None-Match": f'"{etag}"'}).status_code == 304
+    )
+
+    history_id = admin.post(f"{url}/history", json={"modified_count": 1}).json[
+        "history"
+    ][0]["history_id"]
+    admin.delete(f"{url}/history/{history_id}")
+
+    response = admin.get(list_url, headers={"If-None-Match": f'"{etag}"'})
+    assert response.status_code == 200
+    assert response.json["consumables"][0]["history"] == []
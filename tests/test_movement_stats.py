@@ -0,0 +1,51 @@
+from datetime import date, datetime, timedelta, timezone
+
+
+def history_url(consumable: dict) -> str:
+    return (
+        f"/categories/{consumable['category_id']}"
+        f"/consumables/{consumable['consumable_id']}/history"
+    )
+
+
+def stats(client, consumable: dict, since, until, bucket: str) -> list:
+    response = client.get(
+        "/analytics/movements",
+        query_string={
+            "since": since.isoformat(),
+            "until": until.isoformat(),
+            "bucket": bucket,
+            "group_by": "total",
+            "consumable_id": consumable["consumable_id"],
+        },
+    )
+    assert response.status_code == 200
+    columns = ["inflow", "outflow", "net", "movements"]
+    return [[row[column] for column in columns] for row in response.json["stats"]]
+
+
+def test_raw_and_daily_stats_agree(admin, make_consumable):
+    consumable = make_consumable(10)
+    for modified_count in [5, -3, -4]:
+        admin.post(history_url(consumable), json={"modified_count": modified_count})
+    now = datetime.now(timezone.utc)
+    today = date.today()
+
+    hourly = stats(
+        admin, consumable, now - timedelta(hours=2), now + timedelta(hours=2), "hour"
+    )
+    daily = stats(
+        admin, consumable, today - timedelta(days=2), today + timedelta(days=2), "week"
+    )
+
+    assert [sum(column) for column in zip(*hourly)] == [5, 7, -2, 3]
+    assert [sum(column) for column in zip(*daily)] == [5, 7, -2, 3]
+
+
+def test_since_after_until_is_a_bad_request(admin):
+    response = admin.get(
+        "/analytics/movements",
+        query_string={"since": "2024-02-01T00:00:00", "until": "2024-01-01T00:00:00"},
+    )
+
+    assert response.status_code == 400
@@ -0,0 +1,140 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.main import app
+
+
+def history_url(consumable: dict) -> str:
+    return (
+        f"/categories/{consumable['category_id']}"
+        f"/consumables/{consumable['consumable_id']}/history"
+    )
+
+
+def test_movement_changes_the_quantity_and_logs_it(admin, make_consumable):
+    consumable = make_consumable(10)
+
+    response = admin.post(
+        history_url(consumable), json={"modified_count": -3, "description": "used"}
+    )
+
+    assert response.status_code == 200
+    assert response.json["quantity"] == 7
+    [history] = response.json["history"]
+    assert history["modified_count"] == -3
+    assert history["description"] == "used"
+    history = admin.get(history_url(consumable)).json["history"]
+    assert [row["modified_count"] for row in history] == [-3]
+
+
+def test_movement_below_zero_is_rejected(admin, make_consumable):
+    consumable = make_consumable(2)
+
+    response = admin.post(history_url(consumable), json={"modified_count": -3})
+
+    assert response.status_code == 409
+    assert admin.get(history_url(consumable)).json["history"] == []
+
+
+def test_movement_of_unknown_consumable(admin, category):
+    response = admin.post(
+        f"/categories/{category}/consumables/unknown/history",
+        json={"modified_count": 1},
+    )
+
+    assert response.status_code == 404
+
+
+def test_concurrent_movements_lose_no_update(admin, make_consumable):
+    consumable = make_consumable(10)
+    session_id = admin.get_cookie("X-Session-ID").value
+
+    def take_one(_):
+        client = app.test_client()
+        client.set_cookie("X-Session-ID", session_id)
+        return client.post(
+            history_url(consumable), json={"modified_count": -1}
+        ).status_code
+
+    with ThreadPoolExecutor(8) as executor:
+        statuses = list(executor.map(take_one, range(15)))
+
+    assert statuses.count(200) == 10
+    assert statuses.count(409) == 5
+    response = admin.get(
+        f"/categories/{consumable['category_id']}"
+        f"/consumables/{consumable['consumable_id']}"
+    )
+    assert response.json["consumable"]["quantity"] == 0
+
+
+def test_batch_applies_net_movements_per_consumable(admin, make_consumable):
+    first, second = make_consumable(5), make_consumable(1)
+
+    response = admin.post(
+        "/history/batch",
+        json=[
+            {"consumable_id": first["consumable_id"], "modified_count": 2},
+            {"consumable_id": second["consumable_id"], "modified_count": -5},
+            {"consumable_id": "unknown", "modified_count": 1},
+            {"consumable_id": first["consumable_id"], "modified_count": -4},
+        ],
+    )
+
+    assert response.status_code == 200
+    assert response.json["applied"] == 2
+    assert response.json["rejected"] == 2
+    results = response.json["results"]
+    assert [result.get("quantity") for result in results] == [3, None, None, 3]
+    assert results[1]["error"] == "Not enough quantity"
+    assert results[2]["error"] == "Consumable not found"
+    assert admin.get(history_url(second)).json["history"] == []
+
+
+def test_batch_accepts_ndjson(admin, make_consumable):
+    consumable = make_consumable(0)
+
+    response = admin.post(
+        "/history/batch",
+        data=f'{{"consumable_id": "{consumable["consumable_id"]}", '
+        '"modified_count": 1}\n' * 3,
+        content_type="application/x-ndjson",
+    )
+
+    assert response.status_code == 200
+    assert response.json["results"][-1]["quantity"] == 3
+
+
+@pytest.mark.parametrize("modified_count", [2**40, -(2**40), 2**31])
+def test_counts_out_of_range_are_rejected(admin, make_consumable, modified_count):
+    consumable = make_consumable(10)
+
+    single = admin.post(
+        history_url(consumable), json={"modified_count": modified_count}
+    )
+    batch = admin.post(
+        "/history/batch",
+        json=[
+            {
+                "consumable_id": consumable["consumable_id"],
+                "modified_count": modified_count,
+            }
+        ],
+    )
+
+    assert single.status_code == 400
+    assert batch.status_code == 400
+    assert admin.get(history_url(consumable)).json["history"] == []
+
+
+def test_quantity_pushed_out_of_range_is_rejected(admin, make_consumable):
+    consumable = make_consumable(2**31 - 2)
+    movement = {"consumable_id": consumable["consumable_id"], "modified_count": 2}
+
+    single = admin.post(history_url(consumable), json={"modified_count": 2})
+    batch = admin.post("/history/batch", json=[movement])
+
+    assert single.status_code == 400
+    assert batch.status_code == 400
+    assert single.json == batch.json == {"error": "Quantity out of range"}
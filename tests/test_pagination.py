@@ -0,0 +1,58 @@
+import pytest
+
+from app.core.pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    values = ["-quantity,consumable_id", 3, "0b1c"]
+
+    assert decode_cursor(encode_cursor(values)) == values
+
+
+@pytest.mark.parametrize("cursor", ["!!!", "e30=", "NQ=="])
+def test_decode_cursor_rejects_garbage(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize("sort", ["consumable_id", "-quantity", "name"])
+def test_pages_follow_the_cursor(admin, category, make_consumable, sort):
+    created = {
+        make_consumable(quantity)["consumable_id"] for quantity in [3, 1, 3, 2, 5]
+    }
+
+    seen = []
+    cursor = None
+    while True:
+        url = f"/categories/{category}/consumables?limit=2&sort={sort}"
+        response = admin.get(url if cursor is None else f"{url}&cursor={cursor}")
+        assert response.status_code == 200
+        seen += [
+            consumable["consumable_id"] for consumable in response.json["consumables"]
+        ]
+        cursor = response.json["next_cursor"]
+        if cursor is None:
+            break
+
+    assert len(seen) == len(created)
+    assert set(seen) == created
+
+
+def test_cursor_of_another_sort_is_rejected(admin, category, make_consumable):
+    for quantity in [1, 2, 3]:
+        make_consumable(quantity)
+    response = admin.get(f"/categories/{category}/consumables?limit=1&sort=name")
+
+    response = admin.get(
+        f"/categories/{category}/consumables?limit=1&sort=quantity"
+        f"&cursor={response.json['next_cursor']}"
+    )
+
+    assert response.status_code == 400
+    assert response.json == {"error": "Invalid cursor"}
+
+
+def test_invalid_cursor_is_a_bad_request(admin, category):
+    response = admin.get(f"/categories/{category}/consumables?cursor=!!!")
+
+    assert response.status_code == 400
@@ -0,0 +1,85 @@
+import pytest
+from sqlalchemy import update
+
+from app.core import response_cache
+from app.core.database import session_maker
+from app.models.consumable import Consumable
+
+
+@pytest.fixture(autouse=True)
+def memory_backend(monkeypatch):
+    monkeypatch.setattr(
+        response_cache, "backend", response_cache.MemoryCacheBackend(100, 60)
+    )
+
+
+def set_quantity_behind_the_cache(consumable: dict, quantity: int):
+    with session_maker() as db_session:
+        db_session.execute(
+            update(Consumable)
+            .where(Consumable.consumable_id == consumable["consumable_id"])
+            .values(quantity=quantity)
+        )
+        db_session.commit()
+
+
+def consumable_url(consumable: dict) -> str:
+    return (
+        f"/categories/{consumable['category_id']}"
+        f"/consumables/{consumable['consumable_id']}"
+    )
+
+
+def test_reads_are_served_from_the_cache(admin, make_consumable):
+    consumable = make_consumable(10)
+    admin.get(consumable_url(consumable))
+
+    set_quantity_behind_the_cache(consumable, 99)
+
+    response = admin.get(consumable_url(consumable))
+    assert response.json["consumable"]["quantity"] == 10
+
+
+@pytest.mark.parametrize("batch", [False, True])
+def test_movement_invalidates_the_cached_reads(admin, make_consumable, batch):
+    consumable = make_consumable(10)
+    list_url = f"/categories/{consumable['category_id']}/consumables"
+    admin.get(consumable_url(consumable))
+    admin.get(list_url)
+
+    if batch:
+        admin.post(
+            "/history/batch",
+            json=[{"consumable_id": consumable["consumable_id"], "modified_count": 5}],
+        )
+    else:
+        admin.post(f"{consumable_url(consumable)}/history", json={"modified_count": 5})
+
+    assert admin.get(consumable_url(consumable)).json["consumable"]["quantity"] == 15
+    assert admin.get(list_url).json["consumables"][0]["quantity"] == 15
+
+
+def test_update_invalidates_the_category(admin, make_consumable):
+    consumable = make_consumable(10)
+    category_url = f"/categories/{consumable['category_id']}"
+    admin.get(f"{category_url}?include=consumables")
+
+    admin.put(
+        consumable_url(consumable), json={"name": consumable["name"], "quantity": 3}
+    )
+
+    response = admin.get(f"{category_url}?include=consumables")
+    assert response.json["category"]["consumables"][0]["quantity"] == 3
+
+
+def test_failed_write_invalidates_nothing(admin, make_consumable):
+    consumable = make_consumable(2)
+    admin.get(consumable_url(consumable))
+    set_quantity_behind_the_cache(consumable, 0)
+
+    response = admin.post(
+        f"{consumable_url(consumable)}/history", json={"modified_count": -1}
+    )
+
+    assert response.status_code == 409
+    assert admin.get(consumable_url(consumable)).json["consumable"]["quantity"] == 2
@@ -0,0 +1,106 @@
+import base64
+import uuid
+
+import pytest
+
+from app.api.auth import helpers
+from app.core.config import Config
+from app.main import app
+
+
+@pytest.fixture(autouse=True)
+def signed_tokens(monkeypatch):
+    monkeypatch.setattr(Config, "SIGNED_TOKENS", True)
+
+
+@pytest.fixture
+def credentials(client) -> dict:
+    """Credentials of a new worker."""
+    credentials = {
+        "email": f"worker-{uuid.uuid4().hex[:12]}@example.com",
+        "password": "password123",
+    }
+    response = client.post(
+        "/auth/register", json={**credentials, "first_name": "A", "last_name": "B"}
+    )
+    assert response.status_code == 201
+    return credentials
+
+
+@pytest.fixture
+def anonymous():
+    """A client without the session cookie registering leaves behind."""
+    return app.test_client()
+
+
+def bearer(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_token_authenticates_without_a_session(client, anonymous, credentials):
+    response = client.post("/auth/token", json=credentials)
+    assert response.status_code == 200
+    token = response.json["token"]
+
+    assert anonymous.get("/categories", headers=bearer(token)).status_code == 200
+    assert (
+        anonymous.post(
+            "/categories", json={"name": "x"}, headers=bearer(token)
+        ).status_code
+        == 403
+    )
+
+
+def test_wrong_password_gets_no_token(client, credentials):
+    response = client.post(
+        "/auth/token", json={**credentials, "password": "wrong-password"}
+    )
+
+    assert response.status_code == 401
+
+
+def test_forged_token_is_rejected(client, anonymous, credentials):
+    token = client.post("/auth/token", json=credentials).json["token"]
+    payload, signature = token.split(".")
+    claims = helpers.decode_token_part(payload).replace(b'"worker"', b'"admin"')
+
+    forged = f"{helpers.encode_token_part(claims)}.{signature}"
+
+    assert anonymous.get("/categories", headers=bearer(forged)).status_code == 401
+    assert anonymous.get("/categories", headers=bearer("garbage")).status_code == 401
+    assert (
+        anonymous.get(
+            "/categories",
+            headers=bearer(base64.urlsafe_b64encode(b"{}").decode()),
+        ).status_code
+        == 401
+    )
+
+
+def test_expired_token_is_rejected(client, anonymous, credentials, monkeypatch):
+    monkeypatch.setattr(Config, "SIGNED_TOKEN_EXPIRY", -1)
+    token = client.post("/auth/token", json=credentials).json["token"]
+
+    assert anonymous.get("/categories", headers=bearer(token)).status_code == 401
+
+
+def test_revoked_token_is_rejected_by_every_worker(
+    client, anonymous, credentials, monkeypatch
+):
+    token = client.post("/auth/token", json=credentials).json["token"]
+
+    response = anonymous.post("/auth/token/revoke", headers=bearer(token))
+
+    assert response.status_code == 200
+    assert anonymous.get("/categories", headers=bearer(token)).status_code == 401
+    # Another worker only learns about it from the revoked_tokens table.
+    monkeypatch.setattr(helpers, "revoked_tokens", helpers.RevokedTokens())
+    assert anonymous.get("/categories", headers=bearer(token)).status_code == 401
+
+
+def test_tokens_are_off_unless_enabled(client, anonymous, credentials, monkeypatch):
+    token = client.post("/auth/token", json=credentials).json["token"]
+    monkeypatch.setattr(Config, "SIGNED_TOKENS", False)
+
+    assert client.post("/auth/token", json=credentials).status_code == 404
+    assert anonymous.get("/categories", headers=bearer(token)).status_code == 401
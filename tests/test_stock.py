@@ -0,0 +1,113 @@
+from datetime import date, datetime, time, timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+from app.api.analytics.helpers import stock_at_query
+from app.models.consumable import Consumable, ConsumableDailyStats, ConsumableHistory
+
+
+def test_stock_between_todays_movements(admin, make_consumable):
+    consumable = make_consumable(5)
+    url = (
+        f"/categories/{consumable['category_id']}"
+        f"/consumables/{consumable['consumable_id']}"
+    )
+    admin.post(f"{url}/history", json={"modified_count": -2})
+    at = datetime.now().isoformat()
+    admin.post(f"{url}/history", json={"modified_count": 7})
+
+    response = admin.get(f"{url}/stock?at={at}")
+
+    assert response.status_code == 200
+    assert response.json["stock"]["quantity"] == 3
+
+
+def test_consumables_created_later_have_no_stock(admin, category, make_consumable):
+    make_consumable(5)
+
+    response = admin.get(f"/categories/{category}/stock?at=2020-01-01T00:00:00")
+
+    assert response.json["stock"] == []
+
+
+@pytest.fixture
+def backdated_consumable(db_session, make_consumable) -> str:
+    """A consumable with a week of history, set to 7 without a movement."""
+    consumable_id = make_consumable(8)["consumable_id"]
+    week_ago = date.today() - timedelta(days=7)
+    db_session.execute(
+        update(Consumable)
+        .where(Consumable.consumable_id == consumable_id)
+        .values(created_at=week_ago)
+    )
+    db_session.add_all(
+        [
+            ConsumableDailyStats(
+                consumable_id=consumable_id,
+                day=week_ago,
+                inflow=0,
+                outflow=0,
+                movement_count=0,
+                closing_quantity=0,
+            ),
+            ConsumableHistory(
+                consumable_id=consumable_id,
+                modified_count=2,
+                modified_time=datetime.combine(week_ago + timedelta(days=1), time(12)),
+            ),
+            ConsumableDailyStats(
+                consumable_id=consumable_id,
+                day=week_ago + timedelta(days=1),
+                inflow=2,
+                outflow=0,
+                movement_count=1,
+                closing_quantity=2,
+            ),
+            ConsumableDailyStats(
+                consumable_id=consumable_id,
+                day=week_ago + timedelta(days=2),
+                inflow=0,
+                outflow=0,
+                movement_count=0,
+                closing_quantity=7,
+            ),
+            ConsumableHistory(
+                consumable_id=consumable_id,
+                modified_count=1,
+                modified_time=datetime.combine(week_ago + timedelta(days=4), time(12)),
+            ),
+            ConsumableDailyStats(
+                consumable_id=consumable_id,
+                day=week_ago + timedelta(days=4),
+                inflow=1,
+                outflow=0,
+                movement_count=1,
+                closing_quantity=8,
+            ),
+        ]
+    )
+    db_session.flush()
+    return consumable_id
+
+
+# Days after the creation and hour of the day.
+@pytest.mark.parametrize(
+    "day, hour, quantity",
+    [(0, 23, 0), (1, 11, 0), (1, 13, 2), (2, 23, 7), (4, 11, 7), (4, 13, 8), (6, 0, 8)],
+)
+def test_stock_follows_the_rollup(
+    db_session, backdated_consumable, day, hour, quantity
+):
+    at = datetime.combine(date.today() - timedelta(days=7 - day), time(hour))
+
+    [(_, stock)] = db_session.execute(
+        stock_at_query(
+            at,
+            select(Consumable.consumable_id).where(
+                Consumable.consumable_id == backdated_consumable
+            ),
+        )
+    ).all()
+
+    assert stock == quantity